@@ -1,32 +1,66 @@
 # Based on examples/snippets/servers/basic_resource.py
+import ast
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from types import CodeType
+
 from mcp.server.fastmcp import FastMCP
 
 mcp = FastMCP("Calculator with History")
 
-# In-memory storage for calculation history
-calculation_history: list[str] = []
+# In-memory storage for calculation history (bounded, oldest entries are dropped)
+HISTORY_LIMIT = 10_000
+RECENT_LIMIT = 10
+calculation_history: deque[str] = deque(maxlen=HISTORY_LIMIT)
 
 @mcp.tool()
 def add(a: int, b: int) -> int:
     """Add two numbers"""
-    return calculate(f"{a} + {b}")
+    result = a + b
+    calculation_history.append(f"{a} + {b} = {result}")
+    return result
 
 @mcp.tool()
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
-    return calculate(f"{a} * {b}")
+    result = a * b
+    calculation_history.append(f"{a} * {b} = {result}")
+    return result
 
 @mcp.tool()
 def divide(a: float, b: float) -> float:
     """Divide two numbers"""
     if b == 0:
         raise ValueError("Cannot divide by zero")
-    return calculate(f"{a} / {b}")
+    result = a / b
+    calculation_history.append(f"{a} / {b} = {result}")
+    return result
+
+# Only plain arithmetic is allowed in expressions
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.UAdd, ast.USub,
+)
+
+@lru_cache(maxsize=1024)
+def _compile_expr(expression: str) -> CodeType:
+    """Parse, validate and compile an arithmetic expression (cached per expression string)"""
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported expression: {expression}")
+        # bool is an int subclass, so True/False have to be excluded explicitly
+        if isinstance(node, ast.Constant) and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise ValueError(f"Unsupported expression: {expression}")
+    return compile(tree, "<calc>", "eval")
 
 @mcp.tool()
 def calculate(expression: str) -> float:
     """Evaluate a mathematical expression"""
-    result = eval(expression)  # Note: In production, use a safe parser!
+    result = eval(_compile_expr(expression), {"__builtins__": {}}, {})
     calculation_history.append(f"{expression} = {result}")
     return result
 
@@ -35,7 +69,9 @@ def get_recent_history() -> str:
     """Get recent calculation history"""
     if not calculation_history:
         return "No calculations yet"
-    return "\n".join(calculation_history[-10:])  # Last 10 calculations
+    # Last 10 calculations, read from the right end without copying the whole history
+    recent = list(islice(reversed(calculation_history), RECENT_LIMIT))
+    return "\n".join(reversed(recent))
 
 @mcp.resource("history://all")
 def get_all_history() -> str:
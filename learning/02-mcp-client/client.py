@@ -19,13 +19,18 @@ async def run_calculator_client():
             tools = await session.list_tools()
             print(f"Available tools: {[t.name for t in tools.tools]}")
             
-            # Call the add tool
-            result = await session.call_tool("add", {"a": 5, "b": 3})
-            print(f"5 + 3 = {result.content[0].text}")
-            
-            # Call the multiply tool
-            result = await session.call_tool("multiply", {"a": 4, "b": 7})
-            print(f"4 * 7 = {result.content[0].text}")
+            # Call the add and multiply tools concurrently over the same session
+            add_result, multiply_result = await asyncio.gather(
+                session.call_tool("add", {"a": 5, "b": 3}),
+                session.call_tool("multiply", {"a": 4, "b": 7}),
+            )
+            print(f"5 + 3 = {add_result.content[0].text}")
+            print(f"4 * 7 = {multiply_result.content[0].text}")
 
 if __name__ == "__main__":
-    asyncio.run(run_calculator_client())
\ No newline at end of file
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    run(run_calculator_client())
\ No newline at end of file
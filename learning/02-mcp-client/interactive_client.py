@@ -5,6 +5,10 @@ from pydantic import AnyUrl
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+async def read_input(prompt: str) -> str:
+    """Read a line from stdin in a worker thread so the event loop keeps serving the session"""
+    return await asyncio.to_thread(input, prompt)
+
 async def interactive_calculator():
     server_params = StdioServerParameters(
         command="uv",
@@ -18,7 +22,7 @@ async def interactive_calculator():
             print("Calculator Ready! Commands: add, multiply, divide, history, quit")
             
             while True:
-                command = input("\n> ").strip().lower()
+                command = (await read_input("\n> ")).strip().lower()
                 
                 if command == "quit":
                     break
@@ -28,8 +32,8 @@ async def interactive_calculator():
                     print(result.contents[0].text)
                 elif command in ["add", "multiply", "divide"]:
                     try:
-                        a = float(input("First number: "))
-                        b = float(input("Second number: "))
+                        a = float(await read_input("First number: "))
+                        b = float(await read_input("Second number: "))
                         result = await session.call_tool(command, {"a": a, "b": b})
                         print(f"Result: {result.content[0].text}")
                     except Exception as e:
@@ -38,4 +42,9 @@ async def interactive_calculator():
                     print("Unknown command")
 
 if __name__ == "__main__":
-    asyncio.run(interactive_calculator())
\ No newline at end of file
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    run(interactive_calculator())
\ No newline at end of file
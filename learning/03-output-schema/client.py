@@ -1,5 +1,5 @@
 import asyncio
-import json
+import orjson
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
@@ -13,18 +13,24 @@ async def test_weather_service():
         async with ClientSession(read, write) as session:
             await session.initialize()
             
-            # Get weather for a single city
-            result = await session.call_tool("get_weather", {"city": "London"})
+            # Get weather for a single city and compare multiple cities concurrently
+            weather_result, comparison_result = await asyncio.gather(
+                session.call_tool("get_weather", {"city": "London"}),
+                session.call_tool(
+                    "compare_weather", 
+                    {"cities": ["London", "Paris", "Tokyo"]}
+                ),
+            )
             print("Weather in London:")
-            print(json.dumps(result.structuredContent, indent=2))
+            print(orjson.dumps(weather_result.structuredContent, option=orjson.OPT_INDENT_2).decode())
             
-            # Compare multiple cities
-            result = await session.call_tool(
-                "compare_weather", 
-                {"cities": ["London", "Paris", "Tokyo"]}
-            )
             print("\nWeather comparison:")
-            print(json.dumps(result.structuredContent, indent=2))
+            print(orjson.dumps(comparison_result.structuredContent, option=orjson.OPT_INDENT_2).decode())
 
 if __name__ == "__main__":
-    asyncio.run(test_weather_service())
\ No newline at end of file
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    run(test_weather_service())
\ No newline at end of file
@@ -67,17 +67,20 @@ def calculate_fibonacci(n):
             # Get the prompt with different focus areas
             focus_areas = ["general", "performance", "testing"]
             
-            for focus in focus_areas:
-                print(f"\n--- Focus: {focus.upper()} ---")
-                
-                # Get the prompt template
-                prompt_result = await session.get_prompt(
+            # Request all prompt variants concurrently over the same session
+            review_results = await asyncio.gather(*(
+                session.get_prompt(
                     "review_python",
                     arguments={
                         "code": sample_code,
                         "focus_area": focus
                     }
                 )
+                for focus in focus_areas
+            ))
+            
+            for focus, prompt_result in zip(focus_areas, review_results):
+                print(f"\n--- Focus: {focus.upper()} ---")
                 
                 # Display the generated prompt messages
                 print("Generated prompt messages:")
@@ -105,14 +108,17 @@ def calculate_fibonacci(n):
                 }
             ]
             
-            for example in error_examples:
-                print(f"\nError: {example['error_message'][:50]}...")
-                
-                # Get the debugging prompt
-                prompt_result = await session.get_prompt(
+            # Get the debugging prompts concurrently
+            debug_results = await asyncio.gather(*(
+                session.get_prompt(
                     "debug_error",
                     arguments=example
                 )
+                for example in error_examples
+            ))
+            
+            for example, prompt_result in zip(error_examples, debug_results):
+                print(f"\nError: {example['error_message'][:50]}...")
                 
                 # For debug_error, the result is a string
                 prompt_text = prompt_result.messages[0].content.text
@@ -140,17 +146,20 @@ def binary_search(arr, target):
             
             audiences = ["beginner", "developer", "reviewer"]
             
-            for audience in audiences:
-                print(f"\n--- Audience: {audience.upper()} ---")
-                
-                # Get the explanation prompt
-                prompt_result = await session.get_prompt(
+            # Get the explanation prompts concurrently
+            explain_results = await asyncio.gather(*(
+                session.get_prompt(
                     "explain_code",
                     arguments={
                         "code": explanation_code,
                         "audience": audience
                     }
                 )
+                for audience in audiences
+            ))
+            
+            for audience, prompt_result in zip(audiences, explain_results):
+                print(f"\n--- Audience: {audience.upper()} ---")
                 
                 # Show the tailored introduction
                 intro_message = prompt_result.messages[0]
@@ -182,4 +191,9 @@ if __name__ == "__main__":
     print("MCP Prompts Client Example")
     print("This demonstrates the idiomatic usage of MCP prompts\n")
     
-    asyncio.run(demonstrate_prompts())
\ No newline at end of file
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    run(demonstrate_prompts())
\ No newline at end of file
@@ -1,29 +1,45 @@
 # Based on examples/snippets/servers/basic_prompt.py
+from functools import lru_cache
+
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.prompts import base
 
 mcp = FastMCP("Code Review Assistant")
 
-@mcp.prompt(title="Review Python Code")
-def review_python(code: str, focus_area: str = "general") -> list[base.Message]:
-    """Generate a code review prompt for Python code"""
-    
-    focus_prompts = {
+# Fixed prompt messages, built once at import - only the user-supplied code varies per call
+FOCUS_PROMPTS: dict[str, base.UserMessage] = {
+    focus_area: base.UserMessage(text)
+    for focus_area, text in {
         "general": "Focus on code quality, readability, and best practices.",
         "performance": "Focus on performance optimizations and efficiency.",
         "security": "Focus on security vulnerabilities and safety.",
         "testing": "Focus on testability and suggest test cases."
-    }
-    
-    return [
+    }.items()
+}
+
+REVIEW_ACK = base.AssistantMessage("I'll review this code for you.")
+
+AUDIENCE_INTROS: dict[str, base.UserMessage] = {
+    audience: base.UserMessage(text)
+    for audience, text in {
+        "beginner": "Explain this code in simple terms, as if to someone new to programming:",
+        "developer": "Explain what this code does and its key design decisions:",
+        "reviewer": "Provide a technical analysis of this code's architecture and patterns:"
+    }.items()
+}
+
+# Prompt bodies are pure functions of their arguments, so rendered messages are memoized.
+# They are cached as tuples so the shared result can't be mutated by a caller.
+@lru_cache(maxsize=128)
+def _review_python_messages(code: str, focus_area: str) -> tuple[base.Message, ...]:
+    return (
         base.UserMessage(f"Please review this Python code:\n\n```python\n{code}\n```"),
-        base.AssistantMessage("I'll review this code for you."),
-        base.UserMessage(focus_prompts.get(focus_area, focus_prompts["general"]))
-    ]
+        REVIEW_ACK,
+        FOCUS_PROMPTS.get(focus_area, FOCUS_PROMPTS["general"])
+    )
 
-@mcp.prompt(title="Debug Error")
-def debug_error(error_message: str, code_context: str = "") -> str:
-    """Generate a debugging prompt for an error"""
+@lru_cache(maxsize=128)
+def _debug_error_prompt(error_message: str, code_context: str) -> str:
     prompt = f"I'm encountering this error:\n\n{error_message}"
     
     if code_context:
@@ -32,20 +48,27 @@ def debug_error(error_message: str, code_context: str = "") -> str:
     prompt += "\n\nCan you help me understand what's causing this and how to fix it?"
     return prompt
 
+@lru_cache(maxsize=128)
+def _explain_code_messages(code: str, audience: str) -> tuple[base.Message, ...]:
+    return (
+        AUDIENCE_INTROS.get(audience, AUDIENCE_INTROS["developer"]),
+        base.UserMessage(f"```python\n{code}\n```")
+    )
+
+@mcp.prompt(title="Review Python Code")
+def review_python(code: str, focus_area: str = "general") -> tuple[base.Message, ...]:
+    """Generate a code review prompt for Python code"""
+    return _review_python_messages(code, focus_area)
+
+@mcp.prompt(title="Debug Error")
+def debug_error(error_message: str, code_context: str = "") -> str:
+    """Generate a debugging prompt for an error"""
+    return _debug_error_prompt(error_message, code_context)
+
 @mcp.prompt(title="Explain Code")
-def explain_code(code: str, audience: str = "developer") -> list[base.Message]:
+def explain_code(code: str, audience: str = "developer") -> tuple[base.Message, ...]:
     """Generate prompts to explain code to different audiences"""
-    
-    audience_intros = {
-        "beginner": "Explain this code in simple terms, as if to someone new to programming:",
-        "developer": "Explain what this code does and its key design decisions:",
-        "reviewer": "Provide a technical analysis of this code's architecture and patterns:"
-    }
-    
-    return [
-        base.UserMessage(audience_intros.get(audience, audience_intros["developer"])),
-        base.UserMessage(f"```python\n{code}\n```")
-    ]
+    return _explain_code_messages(code, audience)
 
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
@@ -6,183 +6,241 @@ Then run this client: uv run python learning/05-transports/client_sse.py
 """
 
 import asyncio
-import json
+import re
+import sys
 import httpx
+import orjson
 
-async def test_sse_server():
+# SSE events are separated by a blank line (servers may use \n or \r\n line endings)
+SSE_EVENT_BOUNDARY = re.compile(rb"\r\n\r\n|\n\n|\r\r")
+
+BASE_URL = "http://localhost:8000"
+
+# Connection pool shared by the SSE stream and the POST /messages channel
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# JSON-RPC bodies are pre-encoded with orjson and sent as raw content
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def parse_sse_data(event: bytes) -> bytes:
+    """Return the joined `data:` field payload of a single raw SSE event."""
+    data_lines = []
+    for line in event.splitlines():
+        if line.startswith(b"data:"):
+            value = line[5:]
+            data_lines.append(value[1:] if value.startswith(b" ") else value)
+    return b"\n".join(data_lines)
+
+async def test_sse_server(client: httpx.AsyncClient):
     """Test the SSE server."""
-    base_url = "http://localhost:8000"
-    
     print("Connecting to SSE endpoint...")
     
-    # Use a single client for the entire session
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # Connect to SSE endpoint and keep it open
-        async with client.stream("GET", f"{base_url}/sse") as sse_response:
-            session_id = None
-            message_url = None
-            
-            # Create an async queue for communication between reader and sender
-            response_queue = asyncio.Queue()
+    # Connect to SSE endpoint and keep it open
+    async with client.stream("GET", f"{BASE_URL}/sse") as sse_response:
+        loop = asyncio.get_running_loop()
+        
+        # The reader resolves the endpoint future once, and each JSON-RPC response
+        # resolves the future registered for its request id
+        endpoint_future: asyncio.Future[str] = loop.create_future()
+        pending: dict[int, asyncio.Future[dict]] = {}
+        
+        def expect_response(request_id: int) -> asyncio.Future[dict]:
+            """Register a future for a request id before the request is sent."""
+            future = loop.create_future()
+            pending[request_id] = future
+            return future
+        
+        async def wait_for_response(request_id: int, future: asyncio.Future[dict], timeout: float) -> dict:
+            try:
+                return await asyncio.wait_for(future, timeout=timeout)
+            finally:
+                pending.pop(request_id, None)
+        
+        # Create a task to read SSE events
+        async def read_sse_events():
+            """Read events from the SSE stream."""
+            try:
+                # Scan raw bytes for blank-line event boundaries instead of decoding line by line
+                buffer = bytearray()
+                async for chunk in sse_response.aiter_bytes():
+                    buffer += chunk
+                    while match := SSE_EVENT_BOUNDARY.search(buffer):
+                        event_bytes = bytes(buffer[:match.start()])
+                        del buffer[:match.end()]
+                        data = parse_sse_data(event_bytes)
+                        if not data:
+                            continue
+                        # First message should be the endpoint URL
+                        if not endpoint_future.done():
+                            endpoint_future.set_result(data.decode())
+                            continue
+                        # Try to parse as JSON
+                        try:
+                            event = orjson.loads(data)
+                        except orjson.JSONDecodeError:
+                            print(f"\nSSE Data: {data.decode(errors='replace')}")
+                            continue
+                        print(f"\nSSE Response: {orjson.dumps(event, option=orjson.OPT_INDENT_2).decode()}")
+                        # Hand responses to whoever is waiting on that request id
+                        future = pending.get(event.get("id")) if isinstance(event, dict) else None
+                        if future is not None and not future.done():
+                            future.set_result(event)
+            except Exception as e:
+                print(f"SSE reader error: {e}")
+                for future in [endpoint_future, *pending.values()]:
+                    if not future.done():
+                        future.set_exception(e)
+        
+        # Start the SSE reader task
+        sse_task = asyncio.create_task(read_sse_events())
+        
+        try:
+            # Wait for the endpoint message
+            print("Waiting for endpoint...")
+            data = await asyncio.wait_for(endpoint_future, timeout=5.0)
+            if "session_id=" in data:
+                message_url = data
+                session_id = data.split("session_id=")[1]
+                print(f"Got session_id: {session_id}")
+                print(f"Message endpoint: {message_url}")
+            else:
+                print(f"Unexpected first message: {data}")
+                return
             
-            # Create a task to read SSE events
-            async def read_sse_events():
-                """Read events from the SSE stream."""
-                try:
-                    async for line in sse_response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]  # Remove "data: " prefix
-                            if data:
-                                # First message should be the endpoint URL
-                                if not session_id and "session_id=" in data:
-                                    await response_queue.put(("endpoint", data))
-                                else:
-                                    # Try to parse as JSON
-                                    try:
-                                        event = json.loads(data)
-                                        print(f"\nSSE Response: {json.dumps(event, indent=2)}")
-                                        await response_queue.put(("json", event))
-                                    except json.JSONDecodeError:
-                                        print(f"\nSSE Data: {data}")
-                                        await response_queue.put(("text", data))
-                except Exception as e:
-                    print(f"SSE reader error: {e}")
-                    await response_queue.put(("error", str(e)))
+            # Now send messages while keeping SSE connection alive
             
-            # Start the SSE reader task
-            sse_task = asyncio.create_task(read_sse_events())
+            # Initialize the connection
+            print("\n--- Sending initialize ---")
+            init_response = expect_response(1)
+            response = await client.post(
+                f"{BASE_URL}/messages?session_id={session_id}",
+                content=orjson.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "initialize",
+                    "params": {
+                        "protocolVersion": "0.1.0",
+                        "capabilities": {},
+                        "clientInfo": {
+                            "name": "test-client",
+                            "version": "1.0.0"
+                        }
+                    },
+                    "id": 1
+                }),
+                headers=JSON_HEADERS
+            )
+            print(f"POST Response: {response.status_code} {response.text}")
             
+            # Wait for the initialization response - THIS IS CRITICAL
             try:
-                # Wait for the endpoint message
-                print("Waiting for endpoint...")
-                msg_type, data = await asyncio.wait_for(response_queue.get(), timeout=5.0)
-                if msg_type == "endpoint" and "session_id=" in data:
-                    message_url = data
-                    session_id = data.split("session_id=")[1]
-                    print(f"Got session_id: {session_id}")
-                    print(f"Message endpoint: {message_url}")
+                data = await wait_for_response(1, init_response, timeout=5.0)
+                if "result" in data:
+                    print("Initialization successful!")
                 else:
-                    print(f"Unexpected first message: {msg_type} - {data}")
+                    print(f"Initialization failed: {data}")
                     return
-                
-                # Now send messages while keeping SSE connection alive
-                
-                # Initialize the connection
-                print("\n--- Sending initialize ---")
-                response = await client.post(
-                    f"{base_url}/messages?session_id={session_id}",
-                    json={
-                        "jsonrpc": "2.0",
-                        "method": "initialize",
-                        "params": {
-                            "protocolVersion": "0.1.0",
-                            "capabilities": {},
-                            "clientInfo": {
-                                "name": "test-client",
-                                "version": "1.0.0"
-                            }
-                        },
-                        "id": 1
-                    }
-                )
-                print(f"POST Response: {response.status_code} {response.text}")
-                
-                # Wait for the initialization response - THIS IS CRITICAL
-                try:
-                    msg_type, data = await asyncio.wait_for(response_queue.get(), timeout=5.0)
-                    if msg_type == "json" and "result" in data:
-                        print("Initialization successful!")
-                    else:
-                        print(f"Initialization failed: {data}")
-                        return
-                except asyncio.TimeoutError:
-                    print("No response received for initialize - cannot continue")
-                    return
-                
-                # Send initialized notification to complete the handshake
-                print("\n--- Sending initialized notification ---")
-                response = await client.post(
-                    f"{base_url}/messages?session_id={session_id}",
-                    json={
-                        "jsonrpc": "2.0",
-                        "method": "notifications/initialized"
-                        # No id for notifications
-                    }
-                )
-                print(f"POST Response: {response.status_code} {response.text}")
-                
-                # Small delay to ensure the server processes the notification
-                await asyncio.sleep(0.5)
-                
-                # List tools
-                print("\n--- Sending tools/list ---")
-                response = await client.post(
-                    f"{base_url}/messages?session_id={session_id}",
-                    json={
-                        "jsonrpc": "2.0",
-                        "method": "tools/list",
-                        "id": 2
-                    }
-                )
-                print(f"POST Response: {response.status_code} {response.text}")
-                
-                # Wait for and display the response
-                try:
-                    msg_type, data = await asyncio.wait_for(response_queue.get(), timeout=2.0)
-                except asyncio.TimeoutError:
-                    print("No response received for tools/list")
-                
-                # Test a tool call
-                print("\n--- Calling get_weather tool ---")
-                response = await client.post(
-                    f"{base_url}/messages?session_id={session_id}",
-                    json={
-                        "jsonrpc": "2.0",
-                        "method": "tools/call",
-                        "params": {
-                            "name": "get_weather",
-                            "arguments": {
-                                "city": "London"
-                            }
-                        },
-                        "id": 3
-                    }
-                )
-                print(f"POST Response: {response.status_code} {response.text}")
-                
-                # Wait for and display the response
-                try:
-                    msg_type, data = await asyncio.wait_for(response_queue.get(), timeout=2.0)
-                except asyncio.TimeoutError:
-                    print("No response received for get_weather")
-                
-                # List resources
-                print("\n--- Listing resources ---")
-                response = await client.post(
-                    f"{base_url}/messages?session_id={session_id}",
-                    json={
-                        "jsonrpc": "2.0",
-                        "method": "resources/list",
-                        "id": 4
-                    }
-                )
-                print(f"POST Response: {response.status_code} {response.text}")
-                
-                # Wait for and display the response
-                try:
-                    msg_type, data = await asyncio.wait_for(response_queue.get(), timeout=2.0)
-                except asyncio.TimeoutError:
-                    print("No response received for resources/list")
-                
-                print("\n--- Test completed ---")
-                
-            finally:
-                # Cancel the SSE reader task
-                sse_task.cancel()
-                try:
-                    await sse_task
-                except asyncio.CancelledError:
-                    pass
+            except asyncio.TimeoutError:
+                print("No response received for initialize - cannot continue")
+                return
+            
+            # Send initialized notification to complete the handshake
+            print("\n--- Sending initialized notification ---")
+            response = await client.post(
+                f"{BASE_URL}/messages?session_id={session_id}",
+                content=orjson.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "notifications/initialized"
+                    # No id for notifications
+                }),
+                headers=JSON_HEADERS
+            )
+            print(f"POST Response: {response.status_code} {response.text}")
+            
+            # Small delay to ensure the server processes the notification
+            await asyncio.sleep(0.5)
+            
+            # List tools
+            print("\n--- Sending tools/list ---")
+            tools_response = expect_response(2)
+            response = await client.post(
+                f"{BASE_URL}/messages?session_id={session_id}",
+                content=orjson.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "tools/list",
+                    "id": 2
+                }),
+                headers=JSON_HEADERS
+            )
+            print(f"POST Response: {response.status_code} {response.text}")
+            
+            # Wait for and display the response
+            try:
+                await wait_for_response(2, tools_response, timeout=2.0)
+            except asyncio.TimeoutError:
+                print("No response received for tools/list")
+            
+            # Test a tool call
+            print("\n--- Calling get_weather tool ---")
+            weather_response = expect_response(3)
+            response = await client.post(
+                f"{BASE_URL}/messages?session_id={session_id}",
+                content=orjson.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "tools/call",
+                    "params": {
+                        "name": "get_weather",
+                        "arguments": {
+                            "city": "London"
+                        }
+                    },
+                    "id": 3
+                }),
+                headers=JSON_HEADERS
+            )
+            print(f"POST Response: {response.status_code} {response.text}")
+            
+            # Wait for and display the response
+            try:
+                await wait_for_response(3, weather_response, timeout=2.0)
+            except asyncio.TimeoutError:
+                print("No response received for get_weather")
+            
+            # List resources
+            print("\n--- Listing resources ---")
+            resources_response = expect_response(4)
+            response = await client.post(
+                f"{BASE_URL}/messages?session_id={session_id}",
+                content=orjson.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "resources/list",
+                    "id": 4
+                }),
+                headers=JSON_HEADERS
+            )
+            print(f"POST Response: {response.status_code} {response.text}")
+            
+            # Wait for and display the response
+            try:
+                await wait_for_response(4, resources_response, timeout=2.0)
+            except asyncio.TimeoutError:
+                print("No response received for resources/list")
+            
+            print("\n--- Test completed ---")
+            
+        finally:
+            # Cancel the SSE reader task
+            sse_task.cancel()
+            try:
+                await sse_task
+            except asyncio.CancelledError:
+                pass
+
+async def main(runs: int = 1):
+    """Run the SSE test one or more times over a single pooled client."""
+    # Keep one client (and its keep-alive connection pool) for all runs
+    async with httpx.AsyncClient(timeout=30.0, limits=HTTP_LIMITS, http2=True) as client:
+        for _ in range(runs):
+            await test_sse_server(client)
 
 if __name__ == "__main__":
     print("SSE Test Client")
@@ -192,7 +250,15 @@ if __name__ == "__main__":
     print("=" * 50)
     
     try:
-        asyncio.run(test_sse_server())
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    # Optional number of test runs to execute over the same connection pool
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    
+    try:
+        run(main(runs))
     except KeyboardInterrupt:
         print("\nShutting down...")
     except Exception as e:
@@ -1,12 +1,15 @@
 # Based on examples/servers/simple-streamablehttp
 # Real-world HTTP server using OpenWeatherMap API
+import asyncio
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import Dict
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
 from mcp.server.fastmcp import FastMCP
 import httpx
 import anyio
+import orjson
 
 # Load environment variables from .env file
 try:
@@ -32,12 +35,56 @@ mcp = FastMCP(
 API_KEY = os.getenv("OPENWEATHER_API_KEY", "demo")
 BASE_URL = "https://api.openweathermap.org/data/2.5"
 
-# Cache for weather data (city -> (data, timestamp))
-weather_cache: Dict[str, tuple[dict, datetime]] = {}
-CACHE_DURATION = timedelta(minutes=10)  # Cache for 10 minutes
+# Shared HTTP client: keeps pooled keep-alive connections to the API across tool calls
+# instead of paying a new TCP+TLS handshake per request. It lives for the whole server
+# process (FastMCP's lifespan runs per session, so it is not closed there).
+http_client = httpx.AsyncClient(
+    base_url=BASE_URL,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30),
+    timeout=httpx.Timeout(10.0, connect=5.0),
+)
+
+# Cache for weather data (city -> (data, time.monotonic() at fetch, HTTP validators)),
+# kept in least-recently-used order. Expired entries stay until evicted so their
+# ETag/Last-Modified can be used to revalidate with a conditional GET.
+weather_cache: OrderedDict[str, tuple[dict, float, dict]] = OrderedDict()
+CACHE_DURATION = timedelta(minutes=10)  # Serve from cache without revalidating for 10 minutes
+CACHE_DURATION_SECONDS = CACHE_DURATION.total_seconds()
+CACHE_MAX_ENTRIES = 1024  # Oldest entries are evicted beyond this
+
+# API fetches currently in progress (city key -> task), so concurrent requests share one call
+inflight_fetches: dict[str, asyncio.Task] = {}
+
+# Caps how many cities compare_weather looks up at once, to stay under the API rate limit
+COMPARE_CONCURRENCY = 4
+compare_limiter = anyio.Semaphore(COMPARE_CONCURRENCY)
+
+def cache_get(city_key: str, now: float) -> tuple[dict, float, dict] | None:
+    """Return a fresh cache entry (and mark it recently used), or None if missing or expired"""
+    entry = weather_cache.get(city_key)
+    if entry is None or now - entry[1] >= CACHE_DURATION_SECONDS:
+        return None
+    weather_cache.move_to_end(city_key)
+    return entry
+
+def cache_put(city_key: str, data: dict, validators: dict) -> None:
+    """Store data for a city, evicting the least recently used entries beyond the size cap"""
+    weather_cache[city_key] = (data, time.monotonic(), validators)
+    weather_cache.move_to_end(city_key)
+    while len(weather_cache) > CACHE_MAX_ENTRIES:
+        weather_cache.popitem(last=False)
 
-async def fetch_weather_from_api(city: str) -> dict:
-    """Fetch real weather data from OpenWeatherMap API"""
+async def fetch_weather_from_api(city: str, previous: tuple[dict, float, dict] | None = None) -> tuple[dict, dict]:
+    """
+    Fetch real weather data from OpenWeatherMap API.
+    
+    If a previous cache entry is given, its validators are sent as a conditional GET
+    and a 304 Not Modified reuses its data without downloading or parsing a body.
+    
+    Returns:
+        The weather data and the response validators (ETag/Last-Modified) to cache with it
+    """
     if API_KEY == "demo":
         # Return demo data if no API key is set
         return {
@@ -55,49 +102,74 @@ async def fetch_weather_from_api(city: str) -> dict:
             "sunset": "18:45",
             "city": city,
             "country": "XX"
-        }
+        }, {}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{BASE_URL}/weather",
-                params={
-                    "q": city,
-                    "appid": API_KEY,
-                    "units": "metric"  # Use Celsius
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Parse the API response
-            return {
-                "temperature": data["main"]["temp"],
-                "feels_like": data["main"]["feels_like"],
-                "humidity": data["main"]["humidity"],
-                "pressure": data["main"]["pressure"],
-                "condition": data["weather"][0]["main"],
-                "description": data["weather"][0]["description"],
-                "wind_speed": data["wind"]["speed"],
-                "wind_direction": data["wind"].get("deg", 0),
-                "visibility": data.get("visibility", 0),
-                "clouds": data["clouds"]["all"],
-                "sunrise": datetime.fromtimestamp(data["sys"]["sunrise"]).strftime("%H:%M"),
-                "sunset": datetime.fromtimestamp(data["sys"]["sunset"]).strftime("%H:%M"),
-                "city": data["name"],
-                "country": data["sys"]["country"],
-                "timestamp": datetime.now().isoformat()
-            }
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
-                raise ValueError(f"City '{city}' not found")
-            elif e.response.status_code == 401:
-                raise ValueError("Invalid API key. Please check your OPENWEATHER_API_KEY")
-            else:
-                raise ValueError(f"API error: {e.response.status_code}")
-        except Exception as e:
-            logger.error(f"Error fetching weather for {city}: {e}")
-            raise ValueError(f"Failed to fetch weather: {str(e)}")
+    headers = {}
+    if previous is not None:
+        validators = previous[2]
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last-modified" in validators:
+            headers["If-Modified-Since"] = validators["last-modified"]
+    
+    try:
+        response = await http_client.get(
+            "/weather",
+            params={
+                "q": city,
+                "appid": API_KEY,
+                "units": "metric"  # Use Celsius
+            },
+            headers=headers
+        )
+        if response.status_code == 304 and previous is not None:
+            return previous[0], previous[2]
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        validators = {
+            name: response.headers[name]
+            for name in ("etag", "last-modified")
+            if name in response.headers
+        }
+        
+        # Parse the API response
+        return {
+            "temperature": data["main"]["temp"],
+            "feels_like": data["main"]["feels_like"],
+            "humidity": data["main"]["humidity"],
+            "pressure": data["main"]["pressure"],
+            "condition": data["weather"][0]["main"],
+            "description": data["weather"][0]["description"],
+            "wind_speed": data["wind"]["speed"],
+            "wind_direction": data["wind"].get("deg", 0),
+            "visibility": data.get("visibility", 0),
+            "clouds": data["clouds"]["all"],
+            "sunrise": datetime.fromtimestamp(data["sys"]["sunrise"]).strftime("%H:%M"),
+            "sunset": datetime.fromtimestamp(data["sys"]["sunset"]).strftime("%H:%M"),
+            "city": data["name"],
+            "country": data["sys"]["country"],
+            "timestamp": datetime.now().isoformat()
+        }, validators
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise ValueError(f"City '{city}' not found")
+        elif e.response.status_code == 401:
+            raise ValueError("Invalid API key. Please check your OPENWEATHER_API_KEY")
+        else:
+            raise ValueError(f"API error: {e.response.status_code}")
+    except Exception as e:
+        logger.error(f"Error fetching weather for {city}: {e}")
+        raise ValueError(f"Failed to fetch weather: {str(e)}")
+
+async def fetch_weather_coalesced(city_key: str, city: str) -> tuple[dict, dict]:
+    """Fetch weather for a city, joining an identical fetch that is already in flight"""
+    task = inflight_fetches.get(city_key)
+    if task is None:
+        task = asyncio.ensure_future(fetch_weather_from_api(city, weather_cache.get(city_key)))
+        inflight_fetches[city_key] = task
+        task.add_done_callback(lambda _: inflight_fetches.pop(city_key, None))
+    # Shield so one caller being cancelled doesn't cancel the fetch for the others
+    return await asyncio.shield(task)
 
 @mcp.tool()
 async def get_weather(city: str, force_refresh: bool = False) -> dict:
@@ -111,40 +183,41 @@ async def get_weather(city: str, force_refresh: bool = False) -> dict:
     Returns:
         Weather data including temperature, conditions, wind, etc.
     """
+    # Normalize the cache key once; casefold() also handles non-ASCII names like "İstanbul"
+    city_key = city.casefold()
+    
     # Check cache first (unless force_refresh is True)
-    if not force_refresh and city.lower() in weather_cache:
-        cached_data, timestamp = weather_cache[city.lower()]
-        if datetime.now() - timestamp < CACHE_DURATION:
-            logger.info(f"Returning cached weather for {city}")
-            cached_data["cached"] = True
-            cached_data["cache_age_seconds"] = (datetime.now() - timestamp).total_seconds()
-            return cached_data
+    now = time.monotonic()
+    if not force_refresh and (entry := cache_get(city_key, now)):
+        cached_data, fetched_at, _ = entry
+        logger.info(f"Returning cached weather for {city}")
+        return {**cached_data, "cached": True, "cache_age_seconds": now - fetched_at}
     
     # Fetch fresh data
     logger.info(f"Fetching fresh weather data for {city}")
-    weather_data = await fetch_weather_from_api(city)
+    weather_data, validators = await fetch_weather_coalesced(city_key, city)
     
-    # Update cache
-    weather_cache[city.lower()] = (weather_data.copy(), datetime.now())
+    # Update cache (entries are never mutated, so the dict is stored as-is)
+    cache_put(city_key, weather_data, validators)
     
     # Send notification to connected clients (only works in FastMCP context)
     try:
         ctx = mcp.request_context
-        await ctx.session.send_log_message(
-            level="info",
-            data=f"Weather fetched for {city}: {weather_data['temperature']}°C, {weather_data['condition']}",
-            logger="weather_fetch"
+        # Log message and resource update notifications are independent, so send them together
+        await asyncio.gather(
+            ctx.session.send_log_message(
+                level="info",
+                data=f"Weather fetched for {city}: {weather_data['temperature']}°C, {weather_data['condition']}",
+                logger="weather_fetch"
+            ),
+            ctx.session.send_resource_updated(uri=f"weather://{city_key}"),
+            ctx.session.send_resource_updated(uri="weather://recent"),
         )
-        
-        # Notify about resource update
-        await ctx.session.send_resource_updated(uri=f"weather://{city.lower()}")
-        await ctx.session.send_resource_updated(uri="weather://recent")
     except (AttributeError, LookupError):
         # request_context not available in this context
         logger.info(f"Weather fetched for {city}: {weather_data['temperature']}°C, {weather_data['condition']}")
     
-    weather_data["cached"] = False
-    return weather_data
+    return {**weather_data, "cached": False}
 
 @mcp.tool()
 async def get_forecast(city: str, days: int = 5) -> dict:
@@ -178,53 +251,61 @@ async def get_forecast(city: str, days: int = 5) -> dict:
             "message": "Demo forecast - Set OPENWEATHER_API_KEY for real data"
         }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{BASE_URL}/forecast",
-                params={
-                    "q": city,
-                    "appid": API_KEY,
-                    "units": "metric",
-                    "cnt": days * 8  # API returns 8 forecasts per day (3-hour intervals)
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Group forecasts by day
-            daily_forecasts = {}
-            for item in data["list"]:
-                date = datetime.fromtimestamp(item["dt"]).strftime("%Y-%m-%d")
-                if date not in daily_forecasts:
-                    daily_forecasts[date] = {
-                        "temps": [],
-                        "conditions": [],
-                        "rain": 0
-                    }
-                daily_forecasts[date]["temps"].append(item["main"]["temp"])
-                daily_forecasts[date]["conditions"].append(item["weather"][0]["main"])
-                daily_forecasts[date]["rain"] += item.get("rain", {}).get("3h", 0)
-            
-            # Calculate daily summaries
-            forecast = []
-            for date, day_data in list(daily_forecasts.items())[:days]:
-                forecast.append({
-                    "date": date,
-                    "temperature_min": min(day_data["temps"]),
-                    "temperature_max": max(day_data["temps"]),
-                    "condition": max(set(day_data["conditions"]), key=day_data["conditions"].count),
-                    "precipitation_mm": round(day_data["rain"], 1)
-                })
-            
-            return {
-                "city": data["city"]["name"],
-                "country": data["city"]["country"],
-                "forecast": forecast
+    try:
+        response = await http_client.get(
+            "/forecast",
+            params={
+                "q": city,
+                "appid": API_KEY,
+                "units": "metric",
+                "cnt": days * 8  # API returns 8 forecasts per day (3-hour intervals)
             }
-        except Exception as e:
-            logger.error(f"Error fetching forecast for {city}: {e}")
-            raise ValueError(f"Failed to fetch forecast: {str(e)}")
+        )
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        
+        # Group forecasts by day, keeping running aggregates instead of per-day lists.
+        # Days are bucketed with integer arithmetic on the city's local time (the API
+        # gives its UTC offset in seconds); dates are only formatted once per day below.
+        utc_offset = data["city"].get("timezone", 0)
+        daily_forecasts = {}
+        for item in data["list"]:
+            day = (item["dt"] + utc_offset) // 86400
+            temp = item["main"]["temp"]
+            day_data = daily_forecasts.get(day)
+            if day_data is None:
+                day_data = daily_forecasts[day] = {
+                    "temp_min": temp,
+                    "temp_max": temp,
+                    "conditions": Counter(),
+                    "rain": 0
+                }
+            elif temp < day_data["temp_min"]:
+                day_data["temp_min"] = temp
+            elif temp > day_data["temp_max"]:
+                day_data["temp_max"] = temp
+            day_data["conditions"][item["weather"][0]["main"]] += 1
+            day_data["rain"] += item.get("rain", {}).get("3h", 0)
+        
+        # Calculate daily summaries
+        forecast = []
+        for day, day_data in list(daily_forecasts.items())[:days]:
+            forecast.append({
+                "date": datetime.fromtimestamp(day * 86400, timezone.utc).strftime("%Y-%m-%d"),
+                "temperature_min": day_data["temp_min"],
+                "temperature_max": day_data["temp_max"],
+                "condition": day_data["conditions"].most_common(1)[0][0],
+                "precipitation_mm": round(day_data["rain"], 1)
+            })
+        
+        return {
+            "city": data["city"]["name"],
+            "country": data["city"]["country"],
+            "forecast": forecast
+        }
+    except Exception as e:
+        logger.error(f"Error fetching forecast for {city}: {e}")
+        raise ValueError(f"Failed to fetch forecast: {str(e)}")
 
 @mcp.tool()
 async def compare_weather(cities: list[str]) -> dict:
@@ -240,29 +321,30 @@ async def compare_weather(cities: list[str]) -> dict:
     if len(cities) > 10:
         raise ValueError("Maximum 10 cities for comparison")
     
-    results = {}
-    errors = {}
+    # Each distinct city is fetched exactly once; outcomes are stored by position
+    unique_cities = list(dict.fromkeys(cities))
+    outcomes: list[dict | Exception] = [{}] * len(unique_cities)
     
-    # Fetch weather for all cities concurrently
-    async def fetch_city(city: str):
+    async def fetch_city(index: int, city: str):
         try:
-            return city, await get_weather(city)
+            async with compare_limiter:
+                outcomes[index] = await get_weather(city)
         except Exception as e:
-            return city, {"error": str(e)}
+            outcomes[index] = e
     
-    # Use anyio to run fetches concurrently
+    # Use anyio to run fetches concurrently, at most COMPARE_CONCURRENCY at a time
     async with anyio.create_task_group() as tg:
-        tasks = []
-        for city in cities:
-            tasks.append(tg.start_soon(fetch_city, city))
+        for index, city in enumerate(unique_cities):
+            tg.start_soon(fetch_city, index, city)
     
-    # Collect results
-    for city in cities:
-        try:
-            weather_data = await get_weather(city)
-            results[city] = weather_data
-        except Exception as e:
-            errors[city] = str(e)
+    # Collect results in the requested order
+    results = {}
+    errors = {}
+    for city, outcome in zip(unique_cities, outcomes):
+        if isinstance(outcome, Exception):
+            errors[city] = str(outcome)
+        else:
+            results[city] = outcome
     
     # Calculate statistics
     valid_cities = [city for city in results if "error" not in results[city]]
@@ -290,33 +372,37 @@ async def get_recent_weather() -> str:
     if not weather_cache:
         return "No weather data in cache. Use get_weather tool to fetch data."
     
-    recent = []
-    for city, (data, timestamp) in weather_cache.items():
-        age_seconds = (datetime.now() - timestamp).total_seconds()
-        recent.append(f"{city.title()}: {data['temperature']}°C, {data['condition']} (cached {int(age_seconds)}s ago)")
-    
-    return "\n".join(recent)
+    now = time.monotonic()
+    return "\n".join(
+        f"{city.title()}: {data['temperature']}°C, {data['condition']} (cached {int(now - fetched_at)}s ago)"
+        for city, (data, fetched_at, _) in weather_cache.items()
+    )
+
+# Report template for weather://{city}, filled directly from a cached weather dict
+format_city_weather = """Weather for {city}, {country}:
+Temperature: {temperature}°C (feels like {feels_like}°C)
+Condition: {condition} - {description}
+Humidity: {humidity}%
+Wind: {wind_speed} m/s from {wind_direction}°
+Pressure: {pressure} hPa
+Visibility: {visibility_km:.1f} km
+Cloud cover: {clouds}%
+Sunrise: {sunrise} / Sunset: {sunset}
+(Cached {age_seconds} seconds ago)""".format
 
 @mcp.resource("weather://{city}")
 async def get_city_weather_resource(city: str) -> str:
     """Get weather data for a specific city from cache"""
-    city_lower = city.lower()
-    if city_lower not in weather_cache:
+    entry = weather_cache.get(city.casefold())
+    if entry is None:
         return f"No cached data for {city}. Use get_weather tool to fetch data."
     
-    data, timestamp = weather_cache[city_lower]
-    age_seconds = (datetime.now() - timestamp).total_seconds()
-    
-    return f"""Weather for {data['city']}, {data['country']}:
-Temperature: {data['temperature']}°C (feels like {data['feels_like']}°C)
-Condition: {data['condition']} - {data['description']}
-Humidity: {data['humidity']}%
-Wind: {data['wind_speed']} m/s from {data['wind_direction']}°
-Pressure: {data['pressure']} hPa
-Visibility: {data['visibility']/1000:.1f} km
-Cloud cover: {data['clouds']}%
-Sunrise: {data['sunrise']} / Sunset: {data['sunset']}
-(Cached {int(age_seconds)} seconds ago)"""
+    data, fetched_at, _ = entry
+    return format_city_weather(
+        **data,
+        visibility_km=data["visibility"] / 1000,
+        age_seconds=int(time.monotonic() - fetched_at),
+    )
 
 @mcp.prompt(title="Weather Report")
 async def weather_report(cities: str) -> str:
@@ -1,18 +1,24 @@
 # Simplified auth example based on examples/servers/simple-auth
+import hashlib
+import hmac
 from mcp.server.fastmcp import FastMCP
 from typing import Optional
 
 mcp = FastMCP("Secure Service")
 
-# Simple token storage (in production, use proper storage)
+def hash_token(token: str) -> bytes:
+    """Hash a token so plaintext tokens are never kept in memory or compared directly"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+# Simple token storage, keyed by token hash (in production, use proper storage)
 valid_tokens = {
-    "demo-token-123": {"user": "alice", "permissions": ["read", "write"]},
-    "demo-token-456": {"user": "bob", "permissions": ["read"]}
+    hash_token("demo-token-123"): {"user": "alice", "permissions": frozenset({"read", "write"})},
+    hash_token("demo-token-456"): {"user": "bob", "permissions": frozenset({"read"})}
 }
 
 def verify_token(token: str) -> Optional[dict]:
     """Verify a token and return user info"""
-    return valid_tokens.get(token)
+    return valid_tokens.get(hash_token(token))
 
 @mcp.tool()
 def secure_operation(token: str, operation: str, data: str) -> str:
@@ -37,9 +43,10 @@ def secure_operation(token: str, operation: str, data: str) -> str:
 def generate_token(username: str, password: str) -> str:
     """Generate a token (demo only - not secure!)"""
     # In production, properly validate credentials
-    if username == "alice" and password == "secret123":
+    # compare_digest avoids leaking how much of the password matched through timing
+    if username == "alice" and hmac.compare_digest(password.encode(), b"secret123"):
         return "demo-token-123"
-    elif username == "bob" and password == "secret456":
+    elif username == "bob" and hmac.compare_digest(password.encode(), b"secret456"):
         return "demo-token-456"
     else:
         raise ValueError("Invalid credentials")
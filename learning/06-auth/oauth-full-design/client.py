@@ -3,10 +3,10 @@
 
 import asyncio
 import httpx
-from mcp import stdio_client, StdioServerParameters
-from urllib.parse import urlencode
+from mcp import ClientSession, stdio_client, StdioServerParameters
+from urllib.parse import urlencode, unquote_plus
 import secrets
-import json
+import orjson
 
 # Configuration
 OAUTH_PROVIDER_URL = "http://localhost:9000"
@@ -20,100 +20,111 @@ class OAuthClient:
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
         self.state = secrets.token_urlsafe(16)
+        # One pooled client for every call to the provider, so connections are reused
+        # (HTTP/2 is negotiated when the provider is served over TLS)
+        self.client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=10.0
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections"""
+        await self.client.aclose()
     
     async def get_authorization_code(self, username: str, password: str, scopes: list) -> str:
         """
         Simulate authorization code flow (normally would open browser)
         For demo purposes, we'll directly post to the login endpoint
         """
-        async with httpx.AsyncClient() as client:
-            # Step 1: Get authorization URL
-            auth_params = {
-                "client_id": self.client_id,
-                "redirect_uri": self.redirect_uri,
-                "response_type": "code",
-                "scope": " ".join(scopes),
-                "state": self.state
-            }
-            auth_url = f"{OAUTH_PROVIDER_URL}/authorize?" + urlencode(auth_params)
-            
-            print(f"\nAuthorization URL: {auth_url}")
-            print(f"Simulating login with user: {username}")
-            
-            # Step 2: Simulate login (normally user would do this in browser)
-            login_data = {
-                "username": username,
-                "password": password,
-                "client_id": self.client_id,
-                "redirect_uri": self.redirect_uri,
-                "scope": " ".join(scopes),
-                "state": self.state
-            }
-            
-            response = await client.post(
-                f"{OAUTH_PROVIDER_URL}/login",
-                data=login_data,
-                follow_redirects=False
-            )
-            
-            if response.status_code != 302:
-                raise Exception(f"Login failed: {response.text}")
-            
-            # Extract code from redirect
-            location = response.headers.get("location")
-            if not location:
-                raise Exception("No redirect location")
-            
-            # Parse authorization code from redirect URL
-            from urllib.parse import urlparse, parse_qs
-            parsed = urlparse(location)
-            params = parse_qs(parsed.query)
-            
-            if "code" not in params:
-                raise Exception(f"No authorization code in redirect: {location}")
-            
-            return params["code"][0]
+        # Parameters shared by the authorization URL and the login form
+        common_params = {
+            "client_id": self.client_id,
+            "redirect_uri": self.redirect_uri,
+            "scope": " ".join(scopes),
+            "state": self.state
+        }
+        
+        # Step 1: Get authorization URL
+        auth_params = {**common_params, "response_type": "code"}
+        auth_url = f"{OAUTH_PROVIDER_URL}/authorize?" + urlencode(auth_params)
+        
+        print(f"\nAuthorization URL: {auth_url}")
+        print(f"Simulating login with user: {username}")
+        
+        # Step 2: Simulate login (normally user would do this in browser)
+        login_data = {**common_params, "username": username, "password": password}
+        
+        response = await self.client.post(
+            f"{OAUTH_PROVIDER_URL}/login",
+            data=login_data,
+            follow_redirects=False
+        )
+        
+        if response.status_code != 302:
+            raise Exception(f"Login failed: {response.text}")
+        
+        # Extract code from redirect
+        location = response.headers.get("location")
+        if not location:
+            raise Exception("No redirect location")
+        
+        # Pull the authorization code straight out of the redirect's query string
+        query = location.partition("?")[2].partition("#")[0]
+        for part in query.split("&"):
+            if part.startswith("code="):
+                return unquote_plus(part[5:])
+        
+        raise Exception(f"No authorization code in redirect: {location}")
     
     async def exchange_code_for_token(self, code: str) -> dict:
         """Exchange authorization code for access token"""
-        async with httpx.AsyncClient() as client:
-            token_data = {
-                "grant_type": "authorization_code",
-                "code": code,
-                "redirect_uri": self.redirect_uri,
-                "client_id": self.client_id,
-                "client_secret": self.client_secret
-            }
-            
-            response = await client.post(
-                f"{OAUTH_PROVIDER_URL}/token",
-                data=token_data
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Token exchange failed: {response.text}")
-            
-            return response.json()
+        token_data = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        
+        response = await self.client.post(
+            f"{OAUTH_PROVIDER_URL}/token",
+            data=token_data
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Token exchange failed: {response.text}")
+        
+        return response.json()
     
     async def refresh_token(self, refresh_token: str) -> dict:
         """Use refresh token to get new access token"""
-        async with httpx.AsyncClient() as client:
-            token_data = {
-                "grant_type": "refresh_token",
-                "refresh_token": refresh_token,
-                "client_id": self.client_id,
-                "client_secret": self.client_secret
-            }
-            
-            response = await client.post(
-                f"{OAUTH_PROVIDER_URL}/token",
-                data=token_data
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Token refresh failed: {response.text}")
-            
-            return response.json()
+        token_data = {
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+        
+        response = await self.client.post(
+            f"{OAUTH_PROVIDER_URL}/token",
+            data=token_data
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Token refresh failed: {response.text}")
+        
+        return response.json()
+
+def pretty_json(value) -> str:
+    """Render a tool result as indented JSON for display"""
+    return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
 
 def extract_tool_result(result):
     """Extract the actual content from a tool result"""
@@ -128,8 +139,8 @@ def extract_tool_result(result):
                 elif isinstance(text, str):
                     if text.strip():  # Only parse if not empty
                         try:
-                            return json.loads(text)
-                        except json.JSONDecodeError:
+                            return orjson.loads(text)
+                        except orjson.JSONDecodeError:
                             # Text is not JSON, return as is
                             return text
                     else:
@@ -147,12 +158,26 @@ async def test_full_flow():
     print("\nPress Enter to continue...")
     input()
 
-    # Initialize OAuth client
-    oauth_client = OAuthClient(
+    # Initialize OAuth client (closed when the test finishes)
+    async with OAuthClient(
         client_id="test-client",
         client_secret="test-secret",
         redirect_uri="http://localhost:8082/callback"
-    )
+    ) as oauth_client:
+        # One MCP resource server process serves every test user
+        print("\nConnecting to MCP resource server...")
+        server_params = StdioServerParameters(
+            command=MCP_RESOURCE_SERVER_COMMAND[0],
+            args=MCP_RESOURCE_SERVER_COMMAND[1:]
+        )
+        
+        async with stdio_client(server_params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await run_test_cases(oauth_client, session)
+
+async def run_test_cases(oauth_client: OAuthClient, session: ClientSession):
+    """Run the authorization and MCP checks for each demo user"""
     
     # Test with different users
     test_cases = [
@@ -202,120 +227,115 @@ async def test_full_flow():
             print(f"   Expires in: {token_response.get('expires_in')} seconds")
             print(f"   Scopes: {token_response.get('scope')}")
             
-            # Connect to MCP resource server
-            print("\n3. Connecting to MCP resource server...")
-
-            server_params = StdioServerParameters(
-                command=MCP_RESOURCE_SERVER_COMMAND[0],
-                args=MCP_RESOURCE_SERVER_COMMAND[1:]
+            # Reuse the MCP session opened for the whole run
+            print("\n3. Using the MCP resource server session...")
+            
+            # Steps 4-6 are independent calls on the same session, so run them together
+            public_result, profile_result, resources_result = await asyncio.gather(
+                session.call_tool("public_info", arguments={}),
+                session.call_tool(
+                    "get_user_profile",
+                    arguments={"token": access_token}
+                ),
+                session.call_tool(
+                    "list_available_resources",
+                    arguments={"token": access_token}
+                )
             )
             
-            async with stdio_client(server_params) as (read, write):
-                from mcp import ClientSession
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    
-                    # Test public endpoint
-                    print("\n4. Testing public endpoint...")
-                    public_result = await session.call_tool("public_info", arguments={})
-                    public_info = extract_tool_result(public_result)
-                    print(f"   Public info: {json.dumps(public_info, indent=2)}")
-                    
-                    # Get user profile
-                    print("\n5. Getting user profile...")
-                    profile_result = await session.call_tool(
-                        "get_user_profile",
-                        arguments={"token": access_token}
+            # Test public endpoint
+            print("\n4. Testing public endpoint...")
+            public_info = extract_tool_result(public_result)
+            print(f"   Public info: {pretty_json(public_info)}")
+            
+            # Get user profile
+            print("\n5. Getting user profile...")
+            profile = extract_tool_result(profile_result)
+            print(f"   Profile: {pretty_json(profile)}")
+            
+            # List available resources
+            print("\n6. Listing available resources...")
+            resources = extract_tool_result(resources_result)
+            print(f"   Available: {pretty_json(resources)}")
+            
+            # Test operations based on scopes: (heading, result label, failure label, call)
+            operations = []
+            if "read" in test_case["test_operations"]:
+                operations.append((
+                    "7. Testing READ operation...", "Read result", "Read failed",
+                    session.call_tool(
+                        "read_data",
+                        arguments={
+                            "token": access_token,
+                            "resource_id": "doc1"
+                        }
                     )
-                    profile = extract_tool_result(profile_result)
-                    print(f"   Profile: {json.dumps(profile, indent=2)}")
-                    
-                    # List available resources
-                    print("\n6. Listing available resources...")
-                    resources_result = await session.call_tool(
-                        "list_available_resources",
-                        arguments={"token": access_token}
+                ))
+            
+            if "write" in test_case["test_operations"]:
+                operations.append((
+                    "8. Testing WRITE operation...", "Write result", "Write failed",
+                    session.call_tool(
+                        "write_data",
+                        arguments={
+                            "token": access_token,
+                            "resource_id": "new_doc",
+                            "content": f"Content created by {test_case['user']}"
+                        }
                     )
-                    resources = extract_tool_result(resources_result)
-                    print(f"   Available: {json.dumps(resources, indent=2)}")
-                    
-                    # Test operations based on scopes
-                    if "read" in test_case["test_operations"]:
-                        print("\n7. Testing READ operation...")
-                        try:
-                            read_result = await session.call_tool(
-                                "read_data",
-                                arguments={
-                                    "token": access_token,
-                                    "resource_id": "doc1"
-                                }
-                            )
-                            read_data = extract_tool_result(read_result)
-                            print(f"   Read result: {json.dumps(read_data, indent=2)}")
-                        except Exception as e:
-                            print(f"   Read failed: {e}")
-                    
-                    if "write" in test_case["test_operations"]:
-                        print("\n8. Testing WRITE operation...")
-                        try:
-                            write_result = await session.call_tool(
-                                "write_data",
-                                arguments={
-                                    "token": access_token,
-                                    "resource_id": "new_doc",
-                                    "content": f"Content created by {test_case['user']}"
-                                }
-                            )
-                            write_data = extract_tool_result(write_result)
-                            print(f"   Write result: {json.dumps(write_data, indent=2)}")
-                        except Exception as e:
-                            print(f"   Write failed: {e}")
-                    
-                    if "admin" in test_case["test_operations"]:
-                        print("\n9. Testing ADMIN operation...")
-                        try:
-                            admin_result = await session.call_tool(
-                                "admin_operation",
-                                arguments={
-                                    "token": access_token,
-                                    "operation": "system_status"
-                                }
-                            )
-                            admin_data = extract_tool_result(admin_result)
-                            print(f"   Admin result: {json.dumps(admin_data, indent=2)}")
-                        except Exception as e:
-                            print(f"   Admin operation failed: {e}")
-                    
-                    # Test unauthorized operation
-                    print("\n10. Testing unauthorized operation (should fail)...")
-                    if "admin" not in test_case["test_operations"]:
-                        try:
-                            admin_result = await session.call_tool(
-                                "admin_operation",
-                                arguments={
-                                    "token": access_token,
-                                    "operation": "list_users"
-                                }
-                            )
-                            admin_data = extract_tool_result(admin_result)
-                            print(f"   Unexpected success: {admin_data}")
-                        except Exception as e:
-                            print(f"   Expected failure: {e}")
-                    
-                    # Test token refresh if we have a refresh token
-                    if refresh_token:
-                        print("\n11. Testing token refresh...")
-                        new_token_response = await oauth_client.refresh_token(refresh_token)
-                        new_access_token = new_token_response["access_token"]
-                        print(f"   New access token: {new_access_token[:10]}...")
-                        
-                        # Use new token
-                        profile_result = await session.call_tool(
-                            "get_user_profile",
-                            arguments={"token": new_access_token}
-                        )
-                        profile = extract_tool_result(profile_result)
-                        print(f"   Profile with new token: {json.dumps(profile, indent=2)}")
+                ))
+            
+            if "admin" in test_case["test_operations"]:
+                operations.append((
+                    "9. Testing ADMIN operation...", "Admin result", "Admin operation failed",
+                    session.call_tool(
+                        "admin_operation",
+                        arguments={
+                            "token": access_token,
+                            "operation": "system_status"
+                        }
+                    )
+                ))
+            
+            # The permitted operations are independent too; report them in order
+            outcomes = await asyncio.gather(*(call for *_, call in operations), return_exceptions=True)
+            for (heading, result_label, failure_label, _), outcome in zip(operations, outcomes):
+                print(f"\n{heading}")
+                if isinstance(outcome, Exception):
+                    print(f"   {failure_label}: {outcome}")
+                else:
+                    print(f"   {result_label}: {pretty_json(extract_tool_result(outcome))}")
+            
+            # Test unauthorized operation
+            print("\n10. Testing unauthorized operation (should fail)...")
+            if "admin" not in test_case["test_operations"]:
+                try:
+                    admin_result = await session.call_tool(
+                        "admin_operation",
+                        arguments={
+                            "token": access_token,
+                            "operation": "list_users"
+                        }
+                    )
+                    admin_data = extract_tool_result(admin_result)
+                    print(f"   Unexpected success: {admin_data}")
+                except Exception as e:
+                    print(f"   Expected failure: {e}")
+            
+            # Test token refresh if we have a refresh token
+            if refresh_token:
+                print("\n11. Testing token refresh...")
+                new_token_response = await oauth_client.refresh_token(refresh_token)
+                new_access_token = new_token_response["access_token"]
+                print(f"   New access token: {new_access_token[:10]}...")
+                
+                # Use new token
+                profile_result = await session.call_tool(
+                    "get_user_profile",
+                    arguments={"token": new_access_token}
+                )
+                profile = extract_tool_result(profile_result)
+                print(f"   Profile with new token: {pretty_json(profile)}")
         
         except Exception as e:
             import traceback
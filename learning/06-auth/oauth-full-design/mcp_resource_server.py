@@ -3,9 +3,12 @@
 
 from mcp.server.fastmcp import FastMCP
 from typing import Dict, Any
+from collections import OrderedDict
+import hashlib
+import time
 import httpx
 import asyncio
-from functools import wraps
+from functools import lru_cache, wraps
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -18,9 +21,70 @@ INTROSPECTION_ENDPOINT = f"{OAUTH_PROVIDER_URL}/introspect"
 # Initialize MCP server
 mcp = FastMCP("Protected Resource Server")
 
-# Token cache to reduce introspection calls
-token_cache: Dict[str, Dict[str, Any]] = {}
+# Shared HTTP client for introspection: keeps pooled keep-alive connections to the OAuth
+# provider instead of a new connection per cache miss. It lives for the whole server
+# process (FastMCP's lifespan runs per session, so it is not closed there).
+introspection_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    timeout=10.0
+)
+
+# Token cache to reduce introspection calls: token digest -> (token info, time.monotonic()
+# expiry). Every entry gets the same TTL, so insertion order is also expiry order and
+# expired entries sit at the front.
+token_cache: OrderedDict[bytes, tuple[Dict[str, Any], float]] = OrderedDict()
 CACHE_TTL = 300  # 5 minutes
+CACHE_MAX_ENTRIES = 10_000  # Entries closest to expiry are evicted beyond this
+
+def token_cache_key(token: str) -> bytes:
+    """Fixed-size cache key for a token, so raw tokens are never stored"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def sweep_token_cache(now: float) -> None:
+    """Drop expired cache entries (only the oldest entries need checking)"""
+    while token_cache:
+        key, (_, expires_at) = next(iter(token_cache.items()))
+        if expires_at > now:
+            break
+        del token_cache[key]
+
+# Introspections currently in progress (token digest -> task), so concurrent
+# validations of the same token share one request to the OAuth provider
+inflight_introspections: dict[bytes, asyncio.Task] = {}
+
+async def introspect_token(token: str, key: bytes) -> Dict[str, Any]:
+    """Introspect a token with the OAuth provider and cache it if active"""
+    try:
+        response = await introspection_client.post(
+            INTROSPECTION_ENDPOINT,
+            data={"token": token}
+        )
+        
+        if response.status_code != 200:
+            raise ValueError("Failed to introspect token")
+        
+        token_info = response.json()
+        
+        if not token_info.get("active"):
+            raise ValueError("Token is not active")
+        
+        # Split the scopes once here rather than on every tool call that checks them
+        token_info["_scopes_list"] = token_info.get("scope", "").split()
+        token_info["_scopes_set"] = frozenset(token_info["_scopes_list"])
+        
+        # Cache the token info (expiry taken now, so the cache stays in expiry order)
+        token_cache[key] = (token_info, time.monotonic() + CACHE_TTL)
+        token_cache.move_to_end(key)
+        while len(token_cache) > CACHE_MAX_ENTRIES:
+            token_cache.popitem(last=False)
+        
+        logger.info(f"Token validated for user: {token_info.get('username')}")
+        return token_info
+        
+    except Exception as e:
+        logger.error(f"Token validation failed: {e}")
+        raise ValueError(f"Invalid token: {str(e)}")
 
 async def validate_token(token: str) -> Dict[str, Any]:
     """
@@ -28,39 +92,23 @@ async def validate_token(token: str) -> Dict[str, Any]:
     
     Returns token info if valid, raises exception if invalid
     """
-    # Check cache first
-    if token in token_cache:
-        cached = token_cache[token]
-        if cached.get("expires_at", 0) > asyncio.get_event_loop().time():
-            logger.info(f"Token validated from cache for user: {cached.get('username')}")
-            return cached
+    # Check cache first (anything left after the sweep is still fresh)
+    key = token_cache_key(token)
+    sweep_token_cache(time.monotonic())
+    entry = token_cache.get(key)
+    if entry is not None:
+        # Debug level with lazy formatting: this runs on every protected tool call
+        logger.debug("Token validated from cache for user: %s", entry[0].get("username"))
+        return entry[0]
     
-    # Introspect token with OAuth provider
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                INTROSPECTION_ENDPOINT,
-                data={"token": token}
-            )
-            
-            if response.status_code != 200:
-                raise ValueError("Failed to introspect token")
-            
-            token_info = response.json()
-            
-            if not token_info.get("active"):
-                raise ValueError("Token is not active")
-            
-            # Cache the token info
-            token_info["expires_at"] = asyncio.get_event_loop().time() + CACHE_TTL
-            token_cache[token] = token_info
-            
-            logger.info(f"Token validated for user: {token_info.get('username')}")
-            return token_info
-            
-        except Exception as e:
-            logger.error(f"Token validation failed: {e}")
-            raise ValueError(f"Invalid token: {str(e)}")
+    # Introspect token with OAuth provider, joining an introspection already in flight
+    task = inflight_introspections.get(key)
+    if task is None:
+        task = asyncio.ensure_future(introspect_token(token, key))
+        inflight_introspections[key] = task
+        task.add_done_callback(lambda _: inflight_introspections.pop(key, None))
+    # Shield so one caller being cancelled doesn't cancel the introspection for the others
+    return await asyncio.shield(task)
 
 def require_scope(required_scope: str):
     """Decorator to require a specific scope for a tool"""
@@ -69,9 +117,9 @@ def require_scope(required_scope: str):
         async def wrapper(token: str, *args, **kwargs):
             # Validate token and check scope
             token_info = await validate_token(token)
-            scopes = token_info.get("scope", "").split()
+            scopes = token_info["_scopes_list"]
             
-            if required_scope not in scopes:
+            if required_scope not in token_info["_scopes_set"]:
                 raise PermissionError(f"This operation requires '{required_scope}' scope")
             
             # Add user context to kwargs with non-underscore names
@@ -98,7 +146,7 @@ async def get_user_profile(token: str) -> Dict[str, Any]:
     return {
         "username": token_info.get("username"),
         "client_id": token_info.get("client_id"),
-        "scopes": token_info.get("scope", "").split(),
+        "scopes": token_info["_scopes_list"],
         "token_type": token_info.get("token_type"),
         "expires_at": token_info.get("exp")
     }
@@ -132,7 +180,7 @@ async def read_data(token: str, resource_id: str, user_context: str = None, user
         "resource_id": resource_id,
         "data": resource,
         "accessed_by": user_context,
-        "access_time": asyncio.get_event_loop().time()
+        "access_time": time.time()
     }
 
 @mcp.tool()
@@ -154,6 +202,14 @@ async def write_data(token: str, resource_id: str, content: str, user_context: s
         "content_preview": content[:100] if len(content) > 100 else content
     }
 
+# Admin operation results that don't depend on server state
+STATIC_ADMIN_OPERATIONS = {
+    "list_users": {
+        "users": ["alice", "bob", "admin"],
+        "total": 3
+    }
+}
+
 @mcp.tool()
 @require_scope("admin")
 async def admin_operation(token: str, operation: str, user_context: str = None, user_scopes: list = None) -> Dict[str, Any]:
@@ -164,30 +220,54 @@ async def admin_operation(token: str, operation: str, user_context: str = None,
         token: OAuth2 access token
         operation: The admin operation to perform
     """
-    operations = {
-        "list_users": {
-            "users": ["alice", "bob", "admin"],
-            "total": 3
-        },
-        "system_status": {
+    # Only the cache-dependent operations need building per call
+    if operation == "system_status":
+        result = {
             "status": "healthy",
             "uptime": "24 hours",
             "active_tokens": len(token_cache)
-        },
-        "clear_cache": {
+        }
+    elif operation == "clear_cache":
+        result = {
             "cleared": len(token_cache),
             "status": "cache cleared"
         }
-    }
-    
-    if operation == "clear_cache":
         token_cache.clear()
+    else:
+        result = {**STATIC_ADMIN_OPERATIONS.get(operation, {"error": "Unknown operation"})}
     
-    result = operations.get(operation, {"error": "Unknown operation"})
     result["performed_by"] = user_context
     
     return result
 
+@lru_cache(maxsize=64)
+def available_for(scopes: frozenset, is_admin_user: bool) -> Dict[str, tuple]:
+    """
+    Resources and operations for a scope set, built once per combination.
+    The result is shared between calls, so it uses tuples and must not be mutated.
+    """
+    resources = []
+    # Always available
+    operations = ["get_user_profile", "list_available_resources"]
+    
+    if "read" in scopes:
+        operations.append("read_data")
+        resources.extend(["doc1", "doc2"])
+        if is_admin_user or "admin" in scopes:
+            resources.append("doc3")
+    
+    if "write" in scopes:
+        operations.append("write_data")
+    
+    if "admin" in scopes:
+        operations.append("admin_operation")
+        resources.append("all_resources")
+    
+    return {
+        "resources": tuple(resources),
+        "operations": tuple(operations)
+    }
+
 @mcp.tool()
 async def list_available_resources(token: str) -> Dict[str, Any]:
     """
@@ -197,56 +277,43 @@ async def list_available_resources(token: str) -> Dict[str, Any]:
         token: OAuth2 access token
     """
     token_info = await validate_token(token)
-    scopes = token_info.get("scope", "").split()
     username = token_info.get("username")
     
-    available = {
-        "resources": [],
-        "operations": []
-    }
-    
-    # Always available
-    available["operations"].append("get_user_profile")
-    available["operations"].append("list_available_resources")
-    
-    if "read" in scopes:
-        available["operations"].append("read_data")
-        available["resources"].extend(["doc1", "doc2"])
-        if username == "admin" or "admin" in scopes:
-            available["resources"].append("doc3")
-    
-    if "write" in scopes:
-        available["operations"].append("write_data")
-    
-    if "admin" in scopes:
-        available["operations"].append("admin_operation")
-        available["resources"].append("all_resources")
-    
     return {
         "user": username,
-        "scopes": scopes,
-        "available": available
+        "scopes": token_info["_scopes_list"],
+        "available": available_for(token_info["_scopes_set"], username == "admin")
     }
 
+# Public server description, built once (never mutated)
+PUBLIC_INFO = {
+    "server": "MCP Protected Resource Server",
+    "version": "1.0.0",
+    "oauth_provider": OAUTH_PROVIDER_URL,
+    "authentication": "Required for most operations",
+    "public_endpoints": ["public_info"],
+    "protected_endpoints": [
+        "get_user_profile",
+        "read_data (requires 'read' scope)",
+        "write_data (requires 'write' scope)",
+        "admin_operation (requires 'admin' scope)",
+        "list_available_resources"
+    ]
+}
+
 @mcp.tool()
 async def public_info() -> Dict[str, Any]:
     """
     Get public information (no authentication required)
     """
-    return {
-        "server": "MCP Protected Resource Server",
-        "version": "1.0.0",
-        "oauth_provider": OAUTH_PROVIDER_URL,
-        "authentication": "Required for most operations",
-        "public_endpoints": ["public_info"],
-        "protected_endpoints": [
-            "get_user_profile",
-            "read_data (requires 'read' scope)",
-            "write_data (requires 'write' scope)",
-            "admin_operation (requires 'admin' scope)",
-            "list_available_resources"
-        ]
-    }
+    return PUBLIC_INFO
+
+# Suggested resolutions for known authentication/authorization errors
+AUTH_ERROR_RESOLUTIONS = {
+    "invalid_token": "Please obtain a new token from the OAuth provider",
+    "insufficient_scope": "Request additional scopes when obtaining token",
+    "token_expired": "Use refresh token to obtain new access token"
+}
 
 # Error handler for authentication errors
 @mcp.tool()
@@ -258,28 +325,14 @@ async def handle_auth_error(error_type: str, error_description: str) -> Dict[str
         error_type: Type of error (invalid_token, insufficient_scope, etc.)
         error_description: Detailed error description
     """
-    error_responses = {
-        "invalid_token": {
-            "error": "invalid_token",
-            "error_description": error_description,
-            "resolution": "Please obtain a new token from the OAuth provider"
-        },
-        "insufficient_scope": {
-            "error": "insufficient_scope",
-            "error_description": error_description,
-            "resolution": "Request additional scopes when obtaining token"
-        },
-        "token_expired": {
-            "error": "token_expired",
-            "error_description": error_description,
-            "resolution": "Use refresh token to obtain new access token"
-        }
-    }
-    
-    return error_responses.get(error_type, {
+    response = {
         "error": error_type,
         "error_description": error_description
-    })
+    }
+    resolution = AUTH_ERROR_RESOLUTIONS.get(error_type)
+    if resolution:
+        response["resolution"] = resolution
+    return response
 
 if __name__ == "__main__":
     import sys
@@ -2,17 +2,85 @@
 # This server handles authentication and token management
 # It's completely separate from the MCP resource servers
 
+import asyncio
+import base64
+import os
+import heapq
 import secrets
 import time
 import hashlib
+import hmac
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import parse_qs, urlparse
 import logging
+from html import escape
+from string import Template
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response
+from starlette.routing import Route
+import uvicorn
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Password hashing: salted PBKDF2-SHA256, deliberately slow (~0.2s) to resist brute force
+PASSWORD_SALT_BYTES = 16
+PASSWORD_HASH_ITERATIONS = 600_000
+
+# Successful logins are remembered briefly so quick repeat logins skip the slow hash
+VERIFIED_LOGIN_TTL = 60  # seconds
+VERIFIED_LOGIN_MAX_ENTRIES = 1024
+
+# How often expired codes and tokens are purged from memory
+SWEEP_INTERVAL = 1.0  # seconds
+
+# Codes and tokens are 32 random bytes, sent to clients as 43 URL-safe base64 characters
+TOKEN_BYTES = 32
+TOKEN_LENGTH = 43
+
+class TokenPool:
+    """
+    Hands out raw random token values (see encode_token for the wire format),
+    drawing entropy for a whole batch of tokens with a single os.urandom call.
+    """
+    
+    def __init__(self, batch_size: int = 128):
+        self.batch_size = batch_size
+        self.tokens: deque[bytes] = deque()
+    
+    def refill(self) -> None:
+        raw = os.urandom(TOKEN_BYTES * self.batch_size)
+        self.tokens.extend(raw[i:i + TOKEN_BYTES] for i in range(0, len(raw), TOKEN_BYTES))
+    
+    def get(self) -> bytes:
+        if not self.tokens:
+            self.refill()
+        return self.tokens.popleft()
+
+TOKEN_POOL = TokenPool()
+
+def encode_token(raw: bytes) -> str:
+    """Encode a raw token value for clients (unpadded URL-safe base64)"""
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_token(token) -> bytes | None:
+    """Decode a client-supplied token back to its storage key, or None if malformed"""
+    # Form values and JSON batches may contain anything, so only well-formed strings decode
+    if not isinstance(token, str) or len(token) != TOKEN_LENGTH:
+        return None
+    try:
+        return base64.b64decode(token + "=", altchars=b"-_", validate=True)
+    except ValueError:
+        return None
+
+def secure_equals(a: str | None, b: str | None) -> bool:
+    """Compare secrets in constant time, so timing doesn't reveal how much matched"""
+    return hmac.compare_digest((a or "").encode(), (b or "").encode())
+
 class OAuth2Storage:
     """In-memory storage for OAuth2 data"""
     
@@ -55,405 +123,446 @@ class OAuth2Storage:
             }
         }
         
+        # Frozen scope sets, so scope checks are a single subset test
+        for client in self.clients.values():
+            client["scope_set"] = frozenset(client["allowed_scopes"])
+        for user in self.users.values():
+            user["scope_set"] = frozenset(user["scopes"])
+        
         # Active tokens
+        # Both dicts are keyed by the raw token bytes (see decode_token)
         self.auth_codes = {}  # code -> {client_id, user, scopes, expires_at, redirect_uri}
-        self.access_tokens = {}  # token -> {client_id, user, scopes, expires_at}
-        self.refresh_tokens = {}  # token -> {client_id, user, scopes}
+        # token -> {kind, client_id, user, scopes[, expires_at]}, where kind is "access_token"
+        # or "refresh_token", so introspection and revocation need a single lookup
+        self.tokens = {}
+        # Min-heap of (expires_at, code or token), so expired entries are purged in order
+        self.expiry_heap: list[tuple[float, bytes]] = []
+        
+        # (username, SHA-256 of password) -> time.monotonic() expiry, oldest first
+        self.verified_logins: OrderedDict[tuple[str, bytes], float] = OrderedDict()
+        self.verified_logins_lock = threading.Lock()  # verify_password runs in worker threads
+    
+    def store_auth_code(self, code: bytes, info: dict) -> None:
+        """Record an authorization code and schedule its removal at expiry"""
+        self.auth_codes[code] = info
+        heapq.heappush(self.expiry_heap, (info["expires_at"], code))
     
-    def _hash_password(self, password: str) -> str:
-        return hashlib.sha256(password.encode()).hexdigest()
+    def store_token(self, token: bytes, info: dict) -> None:
+        """Record an issued token; tokens that expire are scheduled for removal"""
+        self.tokens[token] = info
+        if "expires_at" in info:
+            heapq.heappush(self.expiry_heap, (info["expires_at"], token))
+    
+    def sweep_expired(self, now: float) -> None:
+        """Drop codes and tokens whose expiry has passed (revoked ones are already gone)"""
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            _, key = heapq.heappop(self.expiry_heap)
+            self.auth_codes.pop(key, None)
+            self.tokens.pop(key, None)
+    
+    def _hash_password(self, password: str, salt: bytes | None = None) -> bytes:
+        """Return salt + PBKDF2 digest; a new random salt is used unless one is given"""
+        if salt is None:
+            salt = secrets.token_bytes(PASSWORD_SALT_BYTES)
+        return salt + hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PASSWORD_HASH_ITERATIONS)
     
     def verify_password(self, username: str, password: str) -> bool:
         user = self.users.get(username)
-        if not user:
+        if not user or password is None:
+            return False
+        
+        # Only a digest of the password is kept in the cache, never the password itself
+        now = time.monotonic()
+        login_key = (username, hashlib.sha256(password.encode()).digest())
+        expires_at = self.verified_logins.get(login_key)
+        if expires_at is not None and expires_at > now:
+            return True
+        
+        stored = user["password_hash"]
+        candidate = self._hash_password(password, stored[:PASSWORD_SALT_BYTES])
+        if not hmac.compare_digest(stored, candidate):
             return False
-        return user["password_hash"] == self._hash_password(password)
+        
+        with self.verified_logins_lock:
+            self.verified_logins[login_key] = now + VERIFIED_LOGIN_TTL
+            self.verified_logins.move_to_end(login_key)
+            while len(self.verified_logins) > VERIFIED_LOGIN_MAX_ENTRIES:
+                self.verified_logins.popitem(last=False)
+        return True
 
 storage = OAuth2Storage()
 
-class OAuth2Handler(BaseHTTPRequestHandler):
-    """HTTP request handler for OAuth2 endpoints"""
+# Every JSON response allows cross-origin access, as browser-based clients need it
+CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+
+def json_response(content: dict, status_code: int = 200) -> JSONResponse:
+    """Send a JSON response"""
+    return JSONResponse(content, status_code=status_code, headers=CORS_HEADERS)
+
+def json_error(status_code: int, error: str, description: str) -> JSONResponse:
+    """Send JSON error response"""
+    return json_response({
+        "error": error,
+        "error_description": description
+    }, status_code)
+
+def error_response(status_code: int, message: str) -> PlainTextResponse:
+    """Send a plain-text error for the browser-facing endpoints"""
+    return PlainTextResponse(message, status_code=status_code)
+
+def json_bytes_response(body: bytes) -> Response:
+    """Send an already-serialized JSON body"""
+    return Response(body, media_type="application/json", headers=CORS_HEADERS)
+
+# Static JSON responses, serialized once at import
+METADATA_BYTES = json.dumps({
+    "issuer": "http://localhost:9000",
+    "authorization_endpoint": "http://localhost:9000/authorize",
+    "token_endpoint": "http://localhost:9000/token",
+    "introspection_endpoint": "http://localhost:9000/introspect",
+    "revocation_endpoint": "http://localhost:9000/revoke",
+    "response_types_supported": ["code"],
+    "grant_types_supported": ["authorization_code", "refresh_token", "client_credentials"],
+    "scopes_supported": ["read", "write", "admin"],
+    "token_endpoint_auth_methods_supported": ["client_secret_post", "client_secret_basic"]
+}).encode()
+REVOKE_OK_BYTES = b'{"status": "success"}'
+
+async def handle_metadata(request: Request) -> Response:
+    """Return OAuth2 server metadata (RFC 8414)"""
+    return json_bytes_response(METADATA_BYTES)
+
+async def handle_authorize(request: Request) -> Response:
+    """Handle authorization endpoint"""
+    params = request.query_params
     
-    def log_message(self, format, *args):
-        """Override to use logger instead of print"""
-        logger.info(f"{self.address_string()} - {format % args}")
+    client_id = params.get("client_id")
+    redirect_uri = params.get("redirect_uri")
+    response_type = params.get("response_type")
+    scope = params.get("scope", "")
+    state = params.get("state")
     
-    def do_GET(self):
-        """Handle GET requests"""
-        parsed_path = urlparse(self.path)
-        
-        if parsed_path.path == "/authorize":
-            self.handle_authorize()
-        elif parsed_path.path == "/login":
-            self.show_login_form()
-        elif parsed_path.path == "/.well-known/oauth-authorization-server":
-            self.handle_metadata()
-        else:
-            self.send_error(404, "Not Found")
-    
-    def do_POST(self):
-        """Handle POST requests"""
-        parsed_path = urlparse(self.path)
-        
-        if parsed_path.path == "/token":
-            self.handle_token()
-        elif parsed_path.path == "/introspect":
-            self.handle_introspect()
-        elif parsed_path.path == "/revoke":
-            self.handle_revoke()
-        elif parsed_path.path == "/login":
-            self.handle_login()
-        else:
-            self.send_error(404, "Not Found")
-    
-    def handle_metadata(self):
-        """Return OAuth2 server metadata (RFC 8414)"""
-        metadata = {
-            "issuer": "http://localhost:9000",
-            "authorization_endpoint": "http://localhost:9000/authorize",
-            "token_endpoint": "http://localhost:9000/token",
-            "introspection_endpoint": "http://localhost:9000/introspect",
-            "revocation_endpoint": "http://localhost:9000/revoke",
-            "response_types_supported": ["code"],
-            "grant_types_supported": ["authorization_code", "refresh_token", "client_credentials"],
-            "scopes_supported": ["read", "write", "admin"],
-            "token_endpoint_auth_methods_supported": ["client_secret_post", "client_secret_basic"]
-        }
-        
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(metadata).encode())
-    
-    def handle_authorize(self):
-        """Handle authorization endpoint"""
-        params = parse_qs(urlparse(self.path).query)
-        
-        client_id = params.get("client_id", [None])[0]
-        redirect_uri = params.get("redirect_uri", [None])[0]
-        response_type = params.get("response_type", [None])[0]
-        scope = params.get("scope", [""])[0]
-        state = params.get("state", [None])[0]
-        
-        # Validate client
-        client = storage.clients.get(client_id)
-        if not client:
-            self.send_error(400, "Invalid client_id")
-            return
-        
-        if redirect_uri not in client["redirect_uris"]:
-            self.send_error(400, "Invalid redirect_uri")
-            return
-        
-        if response_type != "code":
-            self.send_error(400, "Unsupported response_type")
-            return
-        
-        # Show login form (simplified - normally would validate scopes first)
-        login_url = f"/login?client_id={client_id}&redirect_uri={redirect_uri}&scope={scope}&state={state or ''}"
-        self.send_response(302)
-        self.send_header("Location", login_url)
-        self.end_headers()
-    
-    def show_login_form(self):
-        """Display login form"""
-        params = parse_qs(urlparse(self.path).query)
-        
-        html = """
-        <html>
-        <head>
-            <title>OAuth2 Login</title>
-            <style>
-                body { font-family: Arial, sans-serif; max-width: 400px; margin: 50px auto; padding: 20px; }
-                input { width: 100%; padding: 8px; margin: 8px 0; box-sizing: border-box; }
-                button { width: 100%; padding: 10px; background: #007bff; color: white; border: none; cursor: pointer; }
-                button:hover { background: #0056b3; }
-                .info { background: #f0f0f0; padding: 10px; margin: 10px 0; border-radius: 5px; }
-            </style>
-        </head>
-        <body>
-            <h2>OAuth2 Provider Login</h2>
-            <div class="info">
-                <strong>Test Accounts:</strong><br>
-                alice / password123 (read, write)<br>
-                bob / secret456 (read)<br>
-                admin / admin789 (read, write, admin)
-            </div>
-            <form method="POST" action="/login">
-                <input type="hidden" name="client_id" value="{client_id}">
-                <input type="hidden" name="redirect_uri" value="{redirect_uri}">
-                <input type="hidden" name="scope" value="{scope}">
-                <input type="hidden" name="state" value="{state}">
-                <input type="text" name="username" placeholder="Username" required>
-                <input type="password" name="password" placeholder="Password" required>
-                <button type="submit">Login</button>
-            </form>
-        </body>
-        </html>
-        """.format(
-            client_id=params.get("client_id", [""])[0],
-            redirect_uri=params.get("redirect_uri", [""])[0],
-            scope=params.get("scope", [""])[0],
-            state=params.get("state", [""])[0]
-        )
-        
-        self.send_response(200)
-        self.send_header("Content-Type", "text/html")
-        self.end_headers()
-        self.wfile.write(html.encode())
-    
-    def handle_login(self):
-        """Process login form submission"""
-        content_length = int(self.headers.get("Content-Length", 0))
-        post_data = self.rfile.read(content_length).decode()
-        params = parse_qs(post_data)
-        
-        username = params.get("username", [None])[0]
-        password = params.get("password", [None])[0]
-        client_id = params.get("client_id", [None])[0]
-        redirect_uri = params.get("redirect_uri", [None])[0]
-        scope = params.get("scope", [""])[0]
-        state = params.get("state", [None])[0]
-        
-        # Verify credentials
-        if not storage.verify_password(username, password):
-            self.send_error(401, "Invalid credentials")
-            return
-        
-        user = storage.users[username]
-        requested_scopes = scope.split() if scope else []
-        
-        # Check user has requested scopes
-        for s in requested_scopes:
-            if s not in user["scopes"]:
-                self.send_error(403, f"User lacks scope '{s}'")
-                return
-        
-        # Generate authorization code
-        code = secrets.token_urlsafe(32)
-        storage.auth_codes[code] = {
-            "client_id": client_id,
-            "user": username,
-            "scopes": requested_scopes,
-            "expires_at": time.time() + 600,
-            "redirect_uri": redirect_uri
+    # Validate client
+    client = storage.clients.get(client_id)
+    if not client:
+        return error_response(400, "Invalid client_id")
+    
+    if redirect_uri not in client["redirect_uris"]:
+        return error_response(400, "Invalid redirect_uri")
+    
+    if response_type != "code":
+        return error_response(400, "Unsupported response_type")
+    
+    # Show login form (simplified - normally would validate scopes first)
+    login_url = f"/login?client_id={client_id}&redirect_uri={redirect_uri}&scope={scope}&state={state or ''}"
+    return RedirectResponse(login_url, status_code=302)
+
+# Login page, pre-encoded once: only the hidden fields are filled in per request
+LOGIN_PAGE_HEAD = b"""
+    <html>
+    <head>
+        <title>OAuth2 Login</title>
+        <style>
+            body { font-family: Arial, sans-serif; max-width: 400px; margin: 50px auto; padding: 20px; }
+            input { width: 100%; padding: 8px; margin: 8px 0; box-sizing: border-box; }
+            button { width: 100%; padding: 10px; background: #007bff; color: white; border: none; cursor: pointer; }
+            button:hover { background: #0056b3; }
+            .info { background: #f0f0f0; padding: 10px; margin: 10px 0; border-radius: 5px; }
+        </style>
+    </head>
+    <body>
+        <h2>OAuth2 Provider Login</h2>
+        <div class="info">
+            <strong>Test Accounts:</strong><br>
+            alice / password123 (read, write)<br>
+            bob / secret456 (read)<br>
+            admin / admin789 (read, write, admin)
+        </div>
+        <form method="POST" action="/login">
+"""
+LOGIN_HIDDEN_FIELDS = Template("""\
+            <input type="hidden" name="client_id" value="$client_id">
+            <input type="hidden" name="redirect_uri" value="$redirect_uri">
+            <input type="hidden" name="scope" value="$scope">
+            <input type="hidden" name="state" value="$state">
+""")
+LOGIN_PAGE_TAIL = b"""\
+            <input type="text" name="username" placeholder="Username" required>
+            <input type="password" name="password" placeholder="Password" required>
+            <button type="submit">Login</button>
+        </form>
+    </body>
+    </html>
+    """
+
+async def show_login_form(request: Request) -> Response:
+    """Display login form"""
+    params = request.query_params
+    
+    hidden_fields = LOGIN_HIDDEN_FIELDS.substitute(
+        client_id=escape(params.get("client_id", "")),
+        redirect_uri=escape(params.get("redirect_uri", "")),
+        scope=escape(params.get("scope", "")),
+        state=escape(params.get("state", ""))
+    )
+    
+    return HTMLResponse(LOGIN_PAGE_HEAD + hidden_fields.encode() + LOGIN_PAGE_TAIL)
+
+async def handle_login(request: Request) -> Response:
+    """Process login form submission"""
+    params = await request.form()
+    
+    username = params.get("username")
+    password = params.get("password")
+    client_id = params.get("client_id")
+    redirect_uri = params.get("redirect_uri")
+    scope = params.get("scope", "")
+    state = params.get("state")
+    
+    # Verify credentials
+    # Hashing is CPU-bound (hashlib releases the GIL), so keep it off the event loop
+    if not await run_in_threadpool(storage.verify_password, username, password):
+        return error_response(401, "Invalid credentials")
+    
+    user = storage.users[username]
+    requested_scopes = scope.split() if scope else []
+    
+    # Check user has requested scopes
+    if not user["scope_set"].issuperset(requested_scopes):
+        missing = next(s for s in requested_scopes if s not in user["scope_set"])
+        return error_response(403, f"User lacks scope '{missing}'")
+    
+    # Generate authorization code
+    code = TOKEN_POOL.get()
+    storage.store_auth_code(code, {
+        "client_id": client_id,
+        "user": username,
+        "scopes": requested_scopes,
+        "expires_at": time.time() + 600,
+        "redirect_uri": redirect_uri
+    })
+    
+    # Redirect back to client
+    redirect_url = f"{redirect_uri}?code={encode_token(code)}"
+    if state:
+        redirect_url += f"&state={state}"
+    
+    return RedirectResponse(redirect_url, status_code=302)
+
+def grant_authorization_code(params, client_id: str, client: dict) -> Response:
+    """Exchange an authorization code for access and refresh tokens"""
+    code = decode_token(params.get("code"))
+    redirect_uri = params.get("redirect_uri")
+    
+    auth_info = storage.auth_codes.get(code)
+    if not auth_info:
+        return json_error(400, "invalid_grant", "Invalid authorization code")
+    
+    if time.time() > auth_info["expires_at"]:
+        del storage.auth_codes[code]
+        return json_error(400, "invalid_grant", "Authorization code expired")
+    
+    if not secure_equals(auth_info["client_id"], client_id):
+        return json_error(400, "invalid_grant", "Code issued to different client")
+    
+    if redirect_uri != auth_info["redirect_uri"]:
+        return json_error(400, "invalid_grant", "Redirect URI mismatch")
+    
+    # Generate tokens
+    access_token = TOKEN_POOL.get()
+    refresh_token = TOKEN_POOL.get()
+    
+    storage.store_token(access_token, {
+        "kind": "access_token",
+        "client_id": client_id,
+        "user": auth_info["user"],
+        "scopes": auth_info["scopes"],
+        "expires_at": time.time() + 3600
+    })
+    
+    storage.store_token(refresh_token, {
+        "kind": "refresh_token",
+        "client_id": client_id,
+        "user": auth_info["user"],
+        "scopes": auth_info["scopes"]
+    })
+    
+    del storage.auth_codes[code]
+    
+    return json_response({
+        "access_token": encode_token(access_token),
+        "token_type": "Bearer",
+        "expires_in": 3600,
+        "refresh_token": encode_token(refresh_token),
+        "scope": " ".join(auth_info["scopes"])
+    })
+
+def grant_refresh_token(params, client_id: str, client: dict) -> Response:
+    """Issue a new access token for a refresh token"""
+    refresh_token = decode_token(params.get("refresh_token"))
+    
+    refresh_info = storage.tokens.get(refresh_token)
+    if not refresh_info or refresh_info["kind"] != "refresh_token":
+        return json_error(400, "invalid_grant", "Invalid refresh token")
+    
+    if not secure_equals(refresh_info["client_id"], client_id):
+        return json_error(400, "invalid_grant", "Token issued to different client")
+    
+    # Generate new access token
+    access_token = TOKEN_POOL.get()
+    storage.store_token(access_token, {
+        "kind": "access_token",
+        "client_id": client_id,
+        "user": refresh_info["user"],
+        "scopes": refresh_info["scopes"],
+        "expires_at": time.time() + 3600
+    })
+    
+    return json_response({
+        "access_token": encode_token(access_token),
+        "token_type": "Bearer",
+        "expires_in": 3600,
+        "scope": " ".join(refresh_info["scopes"])
+    })
+
+def grant_client_credentials(params, client_id: str, client: dict) -> Response:
+    """Issue an access token to the client itself, with no user involved"""
+    scope = params.get("scope", "")
+    requested_scopes = scope.split() if scope else client["allowed_scopes"]
+    
+    if not client["scope_set"].issuperset(requested_scopes):
+        missing = next(s for s in requested_scopes if s not in client["scope_set"])
+        return json_error(400, "invalid_scope", f"Scope '{missing}' not allowed")
+    
+    access_token = TOKEN_POOL.get()
+    storage.store_token(access_token, {
+        "kind": "access_token",
+        "client_id": client_id,
+        "user": None,
+        "scopes": requested_scopes,
+        "expires_at": time.time() + 3600
+    })
+    
+    return json_response({
+        "access_token": encode_token(access_token),
+        "token_type": "Bearer",
+        "expires_in": 3600,
+        "scope": " ".join(requested_scopes)
+    })
+
+# grant_type -> handler, so the token endpoint dispatches with one dict lookup
+GRANT_HANDLERS = {
+    "authorization_code": grant_authorization_code,
+    "refresh_token": grant_refresh_token,
+    "client_credentials": grant_client_credentials,
+}
+
+async def handle_token(request: Request) -> Response:
+    """Handle token endpoint"""
+    params = await request.form()
+    
+    grant_type = params.get("grant_type")
+    client_id = params.get("client_id")
+    client_secret = params.get("client_secret")
+    
+    # Validate client
+    client = storage.clients.get(client_id)
+    if not client or not secure_equals(client["client_secret"], client_secret):
+        return json_error(401, "invalid_client", "Invalid client credentials")
+    
+    grant = GRANT_HANDLERS.get(grant_type)
+    if grant is None:
+        return json_error(400, "unsupported_grant_type", f"Grant type '{grant_type}' not supported")
+    
+    return grant(params, client_id, client)
+
+def introspect(token) -> dict:
+    """Build the RFC 7662 introspection response for one token"""
+    token_info = storage.tokens.get(decode_token(token))
+    if token_info is None:
+        return {"active": False}
+    if token_info["kind"] == "access_token":
+        is_active = time.time() < token_info["expires_at"]
+        return {
+            "active": is_active,
+            "scope": " ".join(token_info["scopes"]),
+            "client_id": token_info["client_id"],
+            "username": token_info["user"],
+            "token_type": "Bearer",
+            "exp": int(token_info["expires_at"])
         }
-        
-        # Redirect back to client
-        redirect_url = f"{redirect_uri}?code={code}"
-        if state:
-            redirect_url += f"&state={state}"
-        
-        self.send_response(302)
-        self.send_header("Location", redirect_url)
-        self.end_headers()
-    
-    def handle_token(self):
-        """Handle token endpoint"""
-        content_length = int(self.headers.get("Content-Length", 0))
-        post_data = self.rfile.read(content_length).decode()
-        params = parse_qs(post_data)
-        
-        grant_type = params.get("grant_type", [None])[0]
-        client_id = params.get("client_id", [None])[0]
-        client_secret = params.get("client_secret", [None])[0]
-        
-        # Validate client
-        client = storage.clients.get(client_id)
-        if not client or client["client_secret"] != client_secret:
-            self.send_json_error(401, "invalid_client", "Invalid client credentials")
-            return
-        
-        if grant_type == "authorization_code":
-            code = params.get("code", [None])[0]
-            redirect_uri = params.get("redirect_uri", [None])[0]
-            
-            auth_info = storage.auth_codes.get(code)
-            if not auth_info:
-                self.send_json_error(400, "invalid_grant", "Invalid authorization code")
-                return
-            
-            if time.time() > auth_info["expires_at"]:
-                del storage.auth_codes[code]
-                self.send_json_error(400, "invalid_grant", "Authorization code expired")
-                return
-            
-            if auth_info["client_id"] != client_id:
-                self.send_json_error(400, "invalid_grant", "Code issued to different client")
-                return
-            
-            if redirect_uri != auth_info["redirect_uri"]:
-                self.send_json_error(400, "invalid_grant", "Redirect URI mismatch")
-                return
-            
-            # Generate tokens
-            access_token = secrets.token_urlsafe(32)
-            refresh_token = secrets.token_urlsafe(32)
-            
-            storage.access_tokens[access_token] = {
-                "client_id": client_id,
-                "user": auth_info["user"],
-                "scopes": auth_info["scopes"],
-                "expires_at": time.time() + 3600
-            }
-            
-            storage.refresh_tokens[refresh_token] = {
-                "client_id": client_id,
-                "user": auth_info["user"],
-                "scopes": auth_info["scopes"]
-            }
-            
-            del storage.auth_codes[code]
-            
-            response = {
-                "access_token": access_token,
-                "token_type": "Bearer",
-                "expires_in": 3600,
-                "refresh_token": refresh_token,
-                "scope": " ".join(auth_info["scopes"])
-            }
-            
-        elif grant_type == "refresh_token":
-            refresh_token = params.get("refresh_token", [None])[0]
-            
-            refresh_info = storage.refresh_tokens.get(refresh_token)
-            if not refresh_info:
-                self.send_json_error(400, "invalid_grant", "Invalid refresh token")
-                return
-            
-            if refresh_info["client_id"] != client_id:
-                self.send_json_error(400, "invalid_grant", "Token issued to different client")
-                return
-            
-            # Generate new access token
-            access_token = secrets.token_urlsafe(32)
-            storage.access_tokens[access_token] = {
-                "client_id": client_id,
-                "user": refresh_info["user"],
-                "scopes": refresh_info["scopes"],
-                "expires_at": time.time() + 3600
-            }
-            
-            response = {
-                "access_token": access_token,
-                "token_type": "Bearer",
-                "expires_in": 3600,
-                "scope": " ".join(refresh_info["scopes"])
-            }
-            
-        elif grant_type == "client_credentials":
-            # Client credentials flow
-            scope = params.get("scope", [""])[0]
-            requested_scopes = scope.split() if scope else client["allowed_scopes"]
-            
-            for s in requested_scopes:
-                if s not in client["allowed_scopes"]:
-                    self.send_json_error(400, "invalid_scope", f"Scope '{s}' not allowed")
-                    return
-            
-            access_token = secrets.token_urlsafe(32)
-            storage.access_tokens[access_token] = {
-                "client_id": client_id,
-                "user": None,
-                "scopes": requested_scopes,
-                "expires_at": time.time() + 3600
-            }
-            
-            response = {
-                "access_token": access_token,
-                "token_type": "Bearer",
-                "expires_in": 3600,
-                "scope": " ".join(requested_scopes)
-            }
-        else:
-            self.send_json_error(400, "unsupported_grant_type", f"Grant type '{grant_type}' not supported")
-            return
-        
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(response).encode())
-    
-    def handle_introspect(self):
-        """Handle token introspection (RFC 7662)"""
-        content_length = int(self.headers.get("Content-Length", 0))
-        post_data = self.rfile.read(content_length).decode()
-        params = parse_qs(post_data)
-        
-        token = params.get("token", [None])[0]
-        
-        # Check if it's an access token
-        token_info = storage.access_tokens.get(token)
-        if token_info:
-            is_active = time.time() < token_info["expires_at"]
-            response = {
-                "active": is_active,
-                "scope": " ".join(token_info["scopes"]),
-                "client_id": token_info["client_id"],
-                "username": token_info["user"],
-                "token_type": "Bearer",
-                "exp": int(token_info["expires_at"])
-            }
-        else:
-            # Check refresh tokens
-            refresh_info = storage.refresh_tokens.get(token)
-            if refresh_info:
-                response = {
-                    "active": True,
-                    "scope": " ".join(refresh_info["scopes"]),
-                    "client_id": refresh_info["client_id"],
-                    "username": refresh_info["user"],
-                    "token_type": "refresh_token"
-                }
-            else:
-                response = {"active": False}
-        
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(response).encode())
-    
-    def handle_revoke(self):
-        """Handle token revocation (RFC 7009)"""
-        content_length = int(self.headers.get("Content-Length", 0))
-        post_data = self.rfile.read(content_length).decode()
-        params = parse_qs(post_data)
-        
-        token = params.get("token", [None])[0]
-        
-        # Revoke access token
-        if token in storage.access_tokens:
-            del storage.access_tokens[token]
-        
-        # Revoke refresh token
-        if token in storage.refresh_tokens:
-            del storage.refresh_tokens[token]
-        
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(b'{"status": "success"}')
-    
-    def send_json_error(self, status_code: int, error: str, description: str):
-        """Send JSON error response"""
-        self.send_response(status_code)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps({
-            "error": error,
-            "error_description": description
-        }).encode())
+    return {
+        "active": True,
+        "scope": " ".join(token_info["scopes"]),
+        "client_id": token_info["client_id"],
+        "username": token_info["user"],
+        "token_type": "refresh_token"
+    }
+
+async def handle_introspect(request: Request) -> Response:
+    """
+    Handle token introspection (RFC 7662)
+    
+    Besides the standard single `token` form field, several tokens can be checked in
+    one request, either as repeated `token` fields or as a JSON body {"tokens": [...]};
+    batches are answered with {"results": [...]} in request order.
+    """
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = json.loads(await request.body())
+        except json.JSONDecodeError:
+            return json_error(400, "invalid_request", "Malformed JSON body")
+        tokens = body.get("tokens") if isinstance(body, dict) else None
+        if not isinstance(tokens, list):
+            return json_error(400, "invalid_request", "Expected a JSON object with a 'tokens' list")
+        return json_response({"results": [introspect(token) for token in tokens]})
+    
+    params = await request.form()
+    tokens = params.getlist("token")
+    if len(tokens) > 1:
+        return json_response({"results": [introspect(token) for token in tokens]})
+    
+    return json_response(introspect(params.get("token")))
+
+async def handle_revoke(request: Request) -> Response:
+    """Handle token revocation (RFC 7009)"""
+    params = await request.form()
+    
+    token = decode_token(params.get("token"))
+    
+    # Revoke the access or refresh token
+    storage.tokens.pop(token, None)
+    
+    return json_bytes_response(REVOKE_OK_BYTES)
+
+async def sweep_expired_periodically():
+    """Background task purging expired codes and tokens, so memory stays bounded"""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        storage.sweep_expired(time.time())
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Run the expiry sweeper for as long as the server is up"""
+    sweeper = asyncio.create_task(sweep_expired_periodically())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+
+# ASGI app: requests are served concurrently on one event loop over keep-alive connections
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/authorize", handle_authorize, methods=["GET"]),
+    Route("/login", show_login_form, methods=["GET"]),
+    Route("/login", handle_login, methods=["POST"]),
+    Route("/.well-known/oauth-authorization-server", handle_metadata, methods=["GET"]),
+    Route("/token", handle_token, methods=["POST"]),
+    Route("/introspect", handle_introspect, methods=["POST"]),
+    Route("/revoke", handle_revoke, methods=["POST"]),
+])
 
 def run_oauth_server(port: int = 9000):
     """Run the OAuth2 provider server"""
-    server_address = ("", port)
-    httpd = HTTPServer(server_address, OAuth2Handler)
-    
     print(f"OAuth2 Provider Server running on http://localhost:{port}")
     print("\nEndpoints:")
     print(f"  Authorization: http://localhost:{port}/authorize")
@@ -469,7 +578,8 @@ def run_oauth_server(port: int = 9000):
     print("  mcp-resource-server / mcp-server-secret")
     print("  test-client / test-secret")
     
-    httpd.serve_forever()
+    # One worker process: all OAuth state lives in this process's memory
+    uvicorn.run(app, host="", port=port)
 
 if __name__ == "__main__":
     run_oauth_server()
\ No newline at end of file
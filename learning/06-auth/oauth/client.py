@@ -1,8 +1,22 @@
 # OAuth2 client test script
 # Demonstrates how to interact with the OAuth2 server
 import asyncio
+from contextlib import asynccontextmanager
+import sys
+from urllib.parse import parse_qs, urlsplit
 from mcp import ClientSession, StdioServerParameters, stdio_client
-import json
+import orjson
+
+# The flow's report is collected here and written to stdout in one go at the end
+output: list[str] = []
+
+def emit(line: str = "") -> None:
+    """Queue one line of the report"""
+    output.append(line + "\n")
+
+def pretty_json(value) -> str:
+    """Render a tool result as indented JSON for display"""
+    return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
 
 def extract_tool_result(result):
     """Extract the actual content from a tool result"""
@@ -17,8 +31,8 @@ def extract_tool_result(result):
                 elif isinstance(text, str):
                     if text.strip():  # Only parse if not empty
                         try:
-                            return json.loads(text)
-                        except json.JSONDecodeError:
+                            return orjson.loads(text)
+                        except orjson.JSONDecodeError:
                             # Text is not JSON, return as is
                             return text
                     else:
@@ -28,238 +42,266 @@ def extract_tool_result(result):
 
 async def test_oauth_flow():
     """Test the complete OAuth2 authorization code flow"""
-    
-    # Start the OAuth2 server in a separate terminal first:
-    # uv run python learning/auth/2_oauth_flow/oauth_flow_demo_server.py
-    
-    server_params = StdioServerParameters(
-        command="uv",
-        args=["run", "python", "learning/06-auth/oauth/server.py"]
-    )
-    
-    async with stdio_client(server_params) as (read, write):
+    try:
+        await run_oauth_flow()
+    finally:
+        # Written even if the flow fails, so the steps that did run are still reported
+        sys.stdout.write("".join(output))
+        sys.stdout.flush()
+        output.clear()
+
+# Start the OAuth2 server in a separate terminal first:
+# uv run python learning/auth/2_oauth_flow/oauth_flow_demo_server.py
+
+SERVER_PARAMS = StdioServerParameters(
+    command="uv",
+    args=["run", "python", "learning/06-auth/oauth/server.py"]
+)
+
+@asynccontextmanager
+async def oauth_client():
+    """Start the OAuth2 server once and yield an initialized session to it"""
+    async with stdio_client(SERVER_PARAMS) as (read, write):
         async with ClientSession(read, write) as session:
             await session.initialize()
+            yield session
+
+async def run_oauth_flow():
+    """Run the OAuth2 flow scenarios over one session, queueing their output with emit()"""
+    async with oauth_client() as session:
+        emit("OAuth2 Flow Test")
+        emit("=" * 50)
+        
+        await scenario_user_flow(session)
+        await scenario_client_credentials(session)
+        await scenario_admin(session)
+
+async def scenario_user_flow(session: ClientSession):
+    """Authorization code flow for alice: authorize, exchange, use, introspect, refresh, revoke"""
+    # Step 1: Authorization request
+    emit("\n1. AUTHORIZATION REQUEST")
+    emit("-" * 30)
+    auth_result = await session.call_tool(
+    "oauth_authorize",
+    arguments={
+        "client_id": "demo-client-id",
+        "redirect_uri": "http://localhost:8080/callback",
+        "response_type": "code",
+        "scope": "read write profile",
+        "state": "random-state-123",
+        "username": "alice",
+        "password": "password123"
+    }
+    )
+    auth_result = extract_tool_result(auth_result)
+    emit(f"Authorization result: {pretty_json(auth_result)}")
+    
+    # Extract authorization code from redirect URL
+    if "redirect_to" in auth_result:
+        redirect_url = auth_result["redirect_to"]
+        code = parse_qs(urlsplit(redirect_url).query)["code"][0]
+        emit(f"\nAuthorization code: {code}")
+        
+        # Step 2: Token exchange
+        emit("\n2. TOKEN EXCHANGE")
+        emit("-" * 30)
+        token_result = await session.call_tool(
+        "oauth_token",
+        arguments={
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": "http://localhost:8080/callback",
+            "client_id": "demo-client-id",
+            "client_secret": "demo-client-secret"
+        }
+        )
+        token_result = extract_tool_result(token_result)
+        emit(f"Token result: {pretty_json(token_result)}")
+        
+        if "access_token" in token_result:
+            access_token = token_result["access_token"]
+            refresh_token = token_result.get("refresh_token")
             
-            print("OAuth2 Flow Test")
-            print("=" * 50)
+            # Step 3: Access protected resources
+            emit("\n3. ACCESS PROTECTED RESOURCES")
+            emit("-" * 30)
             
-            # Step 1: Authorization request
-            print("\n1. AUTHORIZATION REQUEST")
-            print("-" * 30)
-            auth_result = await session.call_tool(
-            "oauth_authorize",
+            # These reads are independent, so send them together over the session
+            profile_result, userinfo_result, data_result, admin_result = await asyncio.gather(
+                # Get user profile
+                session.call_tool(
+                "protected_resource",
+                arguments={
+                    "access_token": access_token,
+                    "resource": "profile"
+                }
+                ),
+                # Get user info (OpenID Connect)
+                session.call_tool(
+                "oauth_userinfo",
+                arguments={
+                    "access_token": access_token
+                }
+                ),
+                # Access data
+                session.call_tool(
+                "protected_resource",
+                arguments={
+                    "access_token": access_token,
+                    "resource": "data"
+                }
+                ),
+                # Try to access admin resource (should fail for alice)
+                session.call_tool(
+                "protected_resource",
+                arguments={
+                    "access_token": access_token,
+                    "resource": "admin"
+                }
+                )
+            )
+            
+            profile_result = extract_tool_result(profile_result)
+            emit(f"Profile: {pretty_json(profile_result)}")
+            
+            userinfo_result = extract_tool_result(userinfo_result)
+            emit(f"UserInfo: {pretty_json(userinfo_result)}")
+            
+            data_result = extract_tool_result(data_result)
+            emit(f"Data: {pretty_json(data_result)}")
+            
+            admin_result = extract_tool_result(admin_result)
+            emit(f"Admin (should fail): {pretty_json(admin_result)}")
+            
+            # Step 4: Token introspection
+            emit("\n4. TOKEN INTROSPECTION")
+            emit("-" * 30)
+            introspect_result = await session.call_tool(
+            "oauth_introspect",
             arguments={
-                "client_id": "demo-client-id",
-                "redirect_uri": "http://localhost:8080/callback",
-                "response_type": "code",
-                "scope": "read write profile",
-                "state": "random-state-123",
-                "username": "alice",
-                "password": "password123"
+                "token": access_token
             }
             )
-            auth_result = extract_tool_result(auth_result)
-            print(f"Authorization result: {json.dumps(auth_result, indent=2)}")
+            introspect_result = extract_tool_result(introspect_result)
+            emit(f"Token info: {pretty_json(introspect_result)}")
             
-            # Extract authorization code from redirect URL
-            if "redirect_to" in auth_result:
-                redirect_url = auth_result["redirect_to"]
-                code = redirect_url.split("code=")[1].split("&")[0]
-                print(f"\nAuthorization code: {code}")
-                
-                # Step 2: Token exchange
-                print("\n2. TOKEN EXCHANGE")
-                print("-" * 30)
-                token_result = await session.call_tool(
+            # Step 5: Refresh token
+            if refresh_token:
+                emit("\n5. REFRESH TOKEN")
+                emit("-" * 30)
+                refresh_result = await session.call_tool(
                 "oauth_token",
                 arguments={
-                    "grant_type": "authorization_code",
-                    "code": code,
-                    "redirect_uri": "http://localhost:8080/callback",
+                    "grant_type": "refresh_token",
+                    "refresh_token": refresh_token,
                     "client_id": "demo-client-id",
-                    "client_secret": "demo-client-secret"
+                    "client_secret": "demo-client-secret",
+                    "scope": "read profile"  # Request subset of original scopes
                 }
                 )
-                token_result = extract_tool_result(token_result)
-                print(f"Token result: {json.dumps(token_result, indent=2)}")
-                
-                if "access_token" in token_result:
-                    access_token = token_result["access_token"]
-                    refresh_token = token_result.get("refresh_token")
-                    
-                    # Step 3: Access protected resources
-                    print("\n3. ACCESS PROTECTED RESOURCES")
-                    print("-" * 30)
-                    
-                    # Get user profile
-                    profile_result = await session.call_tool(
-                    "protected_resource",
-                    arguments={
-                        "access_token": access_token,
-                        "resource": "profile"
-                    }
-                    )
-                    profile_result = extract_tool_result(profile_result)
-                    print(f"Profile: {json.dumps(profile_result, indent=2)}")
-                    
-                    # Get user info (OpenID Connect)
-                    userinfo_result = await session.call_tool(
-                    "oauth_userinfo",
-                    arguments={
-                        "access_token": access_token
-                    }
-                    )
-                    userinfo_result = extract_tool_result(userinfo_result)
-                    print(f"UserInfo: {json.dumps(userinfo_result, indent=2)}")
-                    
-                    # Access data
-                    data_result = await session.call_tool(
-                    "protected_resource",
-                    arguments={
-                        "access_token": access_token,
-                        "resource": "data"
-                    }
-                    )
-                    data_result = extract_tool_result(data_result)
-                    print(f"Data: {json.dumps(data_result, indent=2)}")
-                    
-                    # Try to access admin resource (should fail for alice)
-                    admin_result = await session.call_tool(
-                    "protected_resource",
-                    arguments={
-                        "access_token": access_token,
-                        "resource": "admin"
-                    }
-                    )
-                    admin_result = extract_tool_result(admin_result)
-                    print(f"Admin (should fail): {json.dumps(admin_result, indent=2)}")
-                    
-                    # Step 4: Token introspection
-                    print("\n4. TOKEN INTROSPECTION")
-                    print("-" * 30)
-                    introspect_result = await session.call_tool(
-                    "oauth_introspect",
-                    arguments={
-                        "token": access_token
-                    }
-                    )
-                    introspect_result = extract_tool_result(introspect_result)
-                    print(f"Token info: {json.dumps(introspect_result, indent=2)}")
-                    
-                    # Step 5: Refresh token
-                    if refresh_token:
-                        print("\n5. REFRESH TOKEN")
-                        print("-" * 30)
-                        refresh_result = await session.call_tool(
-                        "oauth_token",
-                        arguments={
-                            "grant_type": "refresh_token",
-                            "refresh_token": refresh_token,
-                            "client_id": "demo-client-id",
-                            "client_secret": "demo-client-secret",
-                            "scope": "read profile"  # Request subset of original scopes
-                        }
-                        )
-                        refresh_result = extract_tool_result(refresh_result)
-                        print(f"New token: {json.dumps(refresh_result, indent=2)}")
-                    
-                    # Step 6: Revoke token
-                    print("\n6. REVOKE TOKEN")
-                    print("-" * 30)
-                    revoke_result = await session.call_tool(
-                    "oauth_revoke",
-                    arguments={
-                        "token": access_token
-                    }
-                    )
-                    revoke_result = extract_tool_result(revoke_result)
-                    print(f"Revoke result: {json.dumps(revoke_result, indent=2)}")
-                    
-                    # Try to use revoked token
-                    profile_after_revoke = await session.call_tool(
-                    "protected_resource",
-                    arguments={
-                        "access_token": access_token,
-                        "resource": "profile"
-                    }
-                    )
-                    profile_after_revoke = extract_tool_result(profile_after_revoke)
-                    print(f"After revoke (should fail): {json.dumps(profile_after_revoke, indent=2)}")
+                refresh_result = extract_tool_result(refresh_result)
+                emit(f"New token: {pretty_json(refresh_result)}")
             
-            # Test client credentials flow
-            print("\n7. CLIENT CREDENTIALS FLOW")
-            print("-" * 30)
-            client_token_result = await session.call_tool(
-            "oauth_token",
+            # Step 6: Revoke token
+            emit("\n6. REVOKE TOKEN")
+            emit("-" * 30)
+            revoke_result = await session.call_tool(
+            "oauth_revoke",
             arguments={
-                "grant_type": "client_credentials",
-                "client_id": "demo-client-id",
-                "client_secret": "demo-client-secret",
-                "scope": "read"
+                "token": access_token
             }
             )
-            client_token_result = extract_tool_result(client_token_result)
-            print(f"Client token: {json.dumps(client_token_result, indent=2)}")
+            revoke_result = extract_tool_result(revoke_result)
+            emit(f"Revoke result: {pretty_json(revoke_result)}")
             
-            if "access_token" in client_token_result:
-                client_access_token = client_token_result["access_token"]
-                
-                # Access data with client token
-                client_data_result = await session.call_tool(
-                "protected_resource",
-                arguments={
-                    "access_token": client_access_token,
-                    "resource": "data"
-                }
-                )
-                client_data_result = extract_tool_result(client_data_result)
-                print(f"Client data access: {json.dumps(client_data_result, indent=2)}")
-            
-            # Test with admin user
-            print("\n8. ADMIN USER TEST")
-            print("-" * 30)
-            admin_auth_result = await session.call_tool(
-            "oauth_authorize",
+            # Try to use revoked token
+            profile_after_revoke = await session.call_tool(
+            "protected_resource",
             arguments={
-                "client_id": "demo-client-id",
-                "redirect_uri": "http://localhost:8080/callback",
-                "response_type": "code",
-                "scope": "read write profile admin",
-                "username": "admin",
-                "password": "admin123"
+                "access_token": access_token,
+                "resource": "profile"
             }
             )
-            admin_auth_result = extract_tool_result(admin_auth_result)
+            profile_after_revoke = extract_tool_result(profile_after_revoke)
+            emit(f"After revoke (should fail): {pretty_json(profile_after_revoke)}")
+
+async def scenario_client_credentials(session: ClientSession):
+    """Client credentials flow, with no user involved"""
+    # Test client credentials flow
+    emit("\n7. CLIENT CREDENTIALS FLOW")
+    emit("-" * 30)
+    client_token_result = await session.call_tool(
+    "oauth_token",
+    arguments={
+        "grant_type": "client_credentials",
+        "client_id": "demo-client-id",
+        "client_secret": "demo-client-secret",
+        "scope": "read"
+    }
+    )
+    client_token_result = extract_tool_result(client_token_result)
+    emit(f"Client token: {pretty_json(client_token_result)}")
+    
+    if "access_token" in client_token_result:
+        client_access_token = client_token_result["access_token"]
+        
+        # Access data with client token
+        client_data_result = await session.call_tool(
+        "protected_resource",
+        arguments={
+            "access_token": client_access_token,
+            "resource": "data"
+        }
+        )
+        client_data_result = extract_tool_result(client_data_result)
+        emit(f"Client data access: {pretty_json(client_data_result)}")
+
+async def scenario_admin(session: ClientSession):
+    """Authorization code flow for the admin user, reading the admin resource"""
+    # Test with admin user
+    emit("\n8. ADMIN USER TEST")
+    emit("-" * 30)
+    admin_auth_result = await session.call_tool(
+    "oauth_authorize",
+    arguments={
+        "client_id": "demo-client-id",
+        "redirect_uri": "http://localhost:8080/callback",
+        "response_type": "code",
+        "scope": "read write profile admin",
+        "username": "admin",
+        "password": "admin123"
+    }
+    )
+    admin_auth_result = extract_tool_result(admin_auth_result)
+    
+    if "redirect_to" in admin_auth_result:
+        admin_code = parse_qs(urlsplit(admin_auth_result["redirect_to"]).query)["code"][0]
+        
+        admin_token_result = await session.call_tool(
+        "oauth_token",
+        arguments={
+            "grant_type": "authorization_code",
+            "code": admin_code,
+            "redirect_uri": "http://localhost:8080/callback",
+            "client_id": "demo-client-id",
+            "client_secret": "demo-client-secret"
+        }
+        )
+        admin_token_result = extract_tool_result(admin_token_result)
+        
+        if "access_token" in admin_token_result:
+            admin_access_token = admin_token_result["access_token"]
             
-            if "redirect_to" in admin_auth_result:
-                admin_code = admin_auth_result["redirect_to"].split("code=")[1].split("&")[0]
-                
-                admin_token_result = await session.call_tool(
-                "oauth_token",
-                arguments={
-                    "grant_type": "authorization_code",
-                    "code": admin_code,
-                    "redirect_uri": "http://localhost:8080/callback",
-                    "client_id": "demo-client-id",
-                    "client_secret": "demo-client-secret"
-                }
-                )
-                admin_token_result = extract_tool_result(admin_token_result)
-                
-                if "access_token" in admin_token_result:
-                    admin_access_token = admin_token_result["access_token"]
-                    
-                    # Access admin resource
-                    admin_resource_result = await session.call_tool(
-                    "protected_resource",
-                    arguments={
-                        "access_token": admin_access_token,
-                        "resource": "admin"
-                    }
-                    )
-                    admin_resource_result = extract_tool_result(admin_resource_result)
-                    print(f"Admin resource (should succeed): {json.dumps(admin_resource_result, indent=2)}")
+            # Access admin resource
+            admin_resource_result = await session.call_tool(
+            "protected_resource",
+            arguments={
+                "access_token": admin_access_token,
+                "resource": "admin"
+            }
+            )
+            admin_resource_result = extract_tool_result(admin_resource_result)
+            emit(f"Admin resource (should succeed): {pretty_json(admin_resource_result)}")
 
 if __name__ == "__main__":
     asyncio.run(test_oauth_flow())
\ No newline at end of file
@@ -2,13 +2,85 @@
 # Demonstrates authorization code flow, token management, and scope validation
 from mcp.server.fastmcp import FastMCP
 from typing import Optional, Dict, Any
+import base64
+import os
 import secrets
 import time
 import hashlib
+import hmac
+import heapq
+from collections import OrderedDict, deque
 from datetime import datetime
+from functools import lru_cache
+import jwt
 
 mcp = FastMCP("OAuth2 Server")
 
+# Password hashing: salted scrypt, memory-hard (16 MiB per hash) so brute force stays expensive
+PASSWORD_SALT_BYTES = 16
+SCRYPT_PARAMS = {"n": 2**14, "r": 8, "p": 1, "dklen": 32}
+
+# Successful logins are remembered briefly so repeat logins skip the slow hash
+VERIFIED_LOGIN_TTL = 30  # seconds
+VERIFIED_LOGIN_MAX_ENTRIES = 1024
+
+# Access tokens are HS256-signed JWTs, verified locally without a storage lookup;
+# the key is per process, so (like the in-memory storage) tokens don't survive a restart
+JWT_SECRET = secrets.token_bytes(32)
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_TTL = 3600  # seconds
+# Issued tokens are a few hundred characters; anything much longer can't be one of ours
+MAX_ACCESS_TOKEN_LENGTH = 1024
+
+# Most expired authorization codes purged per tool call, so sweeping never stalls a request
+EXPIRY_SWEEP_BUDGET = 16
+
+# Initial revocation list size: one bit per issued access token, grown as needed
+REVOCATION_LIST_BYTES = 1 << 16
+
+# Validated access tokens are remembered briefly, so repeat calls skip re-validation
+VALIDATION_CACHE_TTL = 60  # seconds
+VALIDATION_CACHE_MAX_ENTRIES = 10_000
+
+# Fixed responses for the per-request validation paths, built once instead of per call
+INVALID_TOKEN_ERROR = {"error": "invalid_token", "error_description": "Invalid or expired token"}
+TOKEN_EXPIRED_ERROR = {"error": "invalid_token", "error_description": "Token expired"}
+INSUFFICIENT_SCOPE_ERRORS = {
+    scope: {"error": "insufficient_scope", "error_description": f"Requires '{scope}' scope"}
+    for scope in ("profile", "read", "admin")
+}
+INACTIVE_TOKEN = {"active": False}
+
+class TokenPool:
+    """
+    Hands out random URL-safe tokens like secrets.token_urlsafe(32), drawing
+    entropy for a whole batch of tokens with a single os.urandom call.
+    """
+    
+    TOKEN_BYTES = 32
+    
+    def __init__(self, batch_size: int = 128):
+        self.batch_size = batch_size
+        self.tokens: deque[str] = deque()
+    
+    def refill(self) -> None:
+        raw = os.urandom(self.TOKEN_BYTES * self.batch_size)
+        self.tokens.extend(
+            base64.urlsafe_b64encode(raw[i:i + self.TOKEN_BYTES]).rstrip(b"=").decode()
+            for i in range(0, len(raw), self.TOKEN_BYTES)
+        )
+    
+    def get(self) -> str:
+        if not self.tokens:
+            self.refill()
+        return self.tokens.popleft()
+
+TOKEN_POOL = TokenPool()
+
+def secure_equals(a: Optional[str], b: Optional[str]) -> bool:
+    """Compare secrets in constant time, so timing doesn't reveal how much matched"""
+    return hmac.compare_digest((a or "").encode(), (b or "").encode())
+
 # In-memory storage (use database in production)
 class OAuth2Storage:
     def __init__(self):
@@ -36,26 +108,160 @@ class OAuth2Storage:
             }
         }
         
+        # Frozen scope sets, so scope checks are a single set difference
+        for client in self.clients.values():
+            client["scope_set"] = frozenset(client["allowed_scopes"])
+        for user in self.users.values():
+            user["scope_set"] = frozenset(user["scopes"])
+        
         # Active authorization codes (temporary)
         self.auth_codes = {}  # code -> {client_id, user, scopes, expires_at, redirect_uri}
+        # Min-heap of (expires_at, code), so unredeemed codes are purged once they expire
+        self.expiry_heap: list[tuple[float, str]] = []
         
-        # Active access tokens
-        self.access_tokens = {}  # token -> {client_id, user, scopes, expires_at}
+        # Access tokens are self-contained JWTs; only revocations are tracked, as a
+        # bitstring where bit i is set once the token with revocation index i is revoked
+        self.revocation_bits = bytearray(REVOCATION_LIST_BYTES)
+        self.next_revocation_index = 0
         
         # Refresh tokens
         self.refresh_tokens = {}  # token -> {client_id, user, scopes}
-    
-    def _hash_password(self, password: str) -> str:
-        return hashlib.sha256(password.encode()).hexdigest()
+        
+        # token -> (token info, valid-until time), least recently validated first
+        self.validation_cache: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        
+        # (username, SHA-256 of password) -> time.monotonic() expiry, oldest first
+        self.verified_logins: OrderedDict[tuple[str, bytes], float] = OrderedDict()
+    
+    def _hash_password(self, password: str, salt: Optional[bytes] = None) -> bytes:
+        """Return salt + scrypt digest; a new random salt is used unless one is given"""
+        if salt is None:
+            salt = secrets.token_bytes(PASSWORD_SALT_BYTES)
+        return salt + hashlib.scrypt(password.encode(), salt=salt, **SCRYPT_PARAMS)
+    
+    def store_auth_code(self, code: str, info: dict) -> None:
+        """Record an authorization code and schedule its removal at expiry"""
+        self.auth_codes[code] = info
+        heapq.heappush(self.expiry_heap, (info["expires_at"], code))
+    
+    def sweep_expired(self, now: float, budget: int = EXPIRY_SWEEP_BUDGET) -> None:
+        """Drop up to `budget` authorization codes whose expiry has passed"""
+        while budget and self.expiry_heap and self.expiry_heap[0][0] <= now:
+            _, code = heapq.heappop(self.expiry_heap)
+            self.auth_codes.pop(code, None)
+            budget -= 1
+    
+    def allocate_revocation_index(self) -> int:
+        """Reserve the revocation list bit for a newly issued access token"""
+        index = self.next_revocation_index
+        self.next_revocation_index += 1
+        if index >> 3 >= len(self.revocation_bits):
+            self.revocation_bits.extend(bytes(len(self.revocation_bits)))
+        return index
+    
+    def revoke_index(self, index: int) -> None:
+        self.revocation_bits[index >> 3] |= 1 << (index & 7)
+    
+    def is_revoked(self, index: int) -> bool:
+        return bool(self.revocation_bits[index >> 3] & (1 << (index & 7)))
+    
+    def revoked_count(self) -> int:
+        return int.from_bytes(self.revocation_bits, "little").bit_count()
     
     def verify_password(self, username: str, password: str) -> bool:
         user = self.users.get(username)
         if not user:
             return False
-        return user["password_hash"] == self._hash_password(password)
+        
+        # Only a digest of the password is kept in the cache, never the password itself
+        now = time.monotonic()
+        login_key = (username, hashlib.sha256(password.encode()).digest())
+        expires_at = self.verified_logins.get(login_key)
+        if expires_at is not None and expires_at > now:
+            return True
+        
+        stored = user["password_hash"]
+        if not hmac.compare_digest(stored, self._hash_password(password, stored[:PASSWORD_SALT_BYTES])):
+            return False
+        
+        self.verified_logins[login_key] = now + VERIFIED_LOGIN_TTL
+        self.verified_logins.move_to_end(login_key)
+        if len(self.verified_logins) > VERIFIED_LOGIN_MAX_ENTRIES:
+            self.verified_logins.popitem(last=False)
+        return True
 
 storage = OAuth2Storage()
 
+@lru_cache(maxsize=1)
+def _iso_timestamp(second: int) -> str:
+    """ISO-format a whole-second timestamp; formatted once per second"""
+    return datetime.fromtimestamp(second).isoformat()
+
+def issue_access_token(client_id: str, user: Optional[str], scopes: list) -> str:
+    """Sign a JWT access token carrying everything needed to validate it"""
+    now = int(time.time())
+    claims = {
+        "client_id": client_id,
+        "scopes": scopes,
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_TTL,
+        "jti": secrets.token_urlsafe(8),
+        "rli": storage.allocate_revocation_index()
+    }
+    if user:
+        claims["sub"] = user
+    return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def looks_like_jwt(token: str) -> bool:
+    """Cheap shape check, so malformed input is rejected before any hashing or parsing"""
+    return len(token) <= MAX_ACCESS_TOKEN_LENGTH and token.isascii() and token.count(".") == 2
+
+def decode_access_token(access_token: str) -> Optional[Dict[str, Any]]:
+    """Return the token info for a genuine, unrevoked access token, else None"""
+    if not looks_like_jwt(access_token):
+        return None
+    try:
+        # Expiry is checked by the callers, so expired tokens can still be introspected
+        claims = jwt.decode(access_token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={"verify_exp": False})
+    except jwt.InvalidTokenError:
+        return None
+    if storage.is_revoked(claims["rli"]):
+        return None
+    return {
+        "client_id": claims["client_id"],
+        "user": claims.get("sub"),
+        "scopes": claims["scopes"],
+        "issued_at": claims["iat"],
+        "expires_at": claims["exp"],
+        "jti": claims["jti"],
+        "revocation_index": claims["rli"]
+    }
+
+def validate_access_token(access_token: str) -> tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Return (token info, None) for a usable access token, or (None, error response)"""
+    if not looks_like_jwt(access_token):
+        return None, INVALID_TOKEN_ERROR
+    
+    now = time.time()
+    cached = storage.validation_cache.get(access_token)
+    if cached is not None and now < cached[1]:
+        return cached[0], None
+    
+    token_info = decode_access_token(access_token)
+    
+    if not token_info:
+        return None, INVALID_TOKEN_ERROR
+    
+    if now > token_info["expires_at"]:
+        return None, TOKEN_EXPIRED_ERROR
+    
+    # Never cache past the token's own expiry; revocation drops the entry explicitly
+    storage.validation_cache[access_token] = (token_info, min(now + VALIDATION_CACHE_TTL, token_info["expires_at"]))
+    storage.validation_cache.move_to_end(access_token)
+    if len(storage.validation_cache) > VALIDATION_CACHE_MAX_ENTRIES:
+        storage.validation_cache.popitem(last=False)
+    return token_info, None
+
 @mcp.tool()
 def oauth_authorize(
     client_id: str,
@@ -93,9 +299,9 @@ def oauth_authorize(
     
     # Parse requested scopes
     requested_scopes = scope.split()
-    for s in requested_scopes:
-        if s not in client["allowed_scopes"]:
-            return {"error": "invalid_scope", "error_description": f"Scope '{s}' not allowed for client"}
+    if not client["scope_set"].issuperset(requested_scopes):
+        s = next(s for s in requested_scopes if s not in client["scope_set"])
+        return {"error": "invalid_scope", "error_description": f"Scope '{s}' not allowed for client"}
     
     # Authenticate user (normally done via web UI)
     if not username or not password:
@@ -112,19 +318,19 @@ def oauth_authorize(
     user = storage.users[username]
     
     # Check if user has the requested scopes
-    for s in requested_scopes:
-        if s not in user["scopes"]:
-            return {"error": "invalid_scope", "error_description": f"User lacks scope '{s}'"}
+    if not user["scope_set"].issuperset(requested_scopes):
+        s = next(s for s in requested_scopes if s not in user["scope_set"])
+        return {"error": "invalid_scope", "error_description": f"User lacks scope '{s}'"}
     
     # Generate authorization code
-    auth_code = secrets.token_urlsafe(32)
-    storage.auth_codes[auth_code] = {
+    auth_code = TOKEN_POOL.get()
+    storage.store_auth_code(auth_code, {
         "client_id": client_id,
         "user": username,
         "scopes": requested_scopes,
         "expires_at": time.time() + 600,  # 10 minutes
         "redirect_uri": redirect_uri
-    }
+    })
     
     # Build redirect URL
     redirect_url = f"{redirect_uri}?code={auth_code}"
@@ -159,12 +365,14 @@ def oauth_token(
         refresh_token: Refresh token (for refresh_token grant)
         scope: Optional scope restriction for refresh_token grant
     """
+    storage.sweep_expired(time.time())
+    
     # Validate client credentials
     if not client_id or not client_secret:
         return {"error": "invalid_client", "error_description": "Missing client credentials"}
     
     client = storage.clients.get(client_id)
-    if not client or client["client_secret"] != client_secret:
+    if not client or not secure_equals(client["client_secret"], client_secret):
         return {"error": "invalid_client", "error_description": "Invalid client credentials"}
     
     if grant_type == "authorization_code":
@@ -182,29 +390,23 @@ def oauth_token(
             return {"error": "invalid_grant", "error_description": "Authorization code expired"}
         
         # Validate client matches
-        if auth_info["client_id"] != client_id:
+        if not secure_equals(auth_info["client_id"], client_id):
             return {"error": "invalid_grant", "error_description": "Code was issued to different client"}
         
         # Validate redirect URI matches
-        if redirect_uri != auth_info["redirect_uri"]:
+        if not secure_equals(redirect_uri, auth_info["redirect_uri"]):
             return {"error": "invalid_grant", "error_description": "Redirect URI mismatch"}
         
         # Generate tokens
-        access_token = secrets.token_urlsafe(32)
-        refresh_token_value = secrets.token_urlsafe(32)
-        
-        # Store tokens
-        storage.access_tokens[access_token] = {
-            "client_id": client_id,
-            "user": auth_info["user"],
-            "scopes": auth_info["scopes"],
-            "expires_at": time.time() + 3600  # 1 hour
-        }
+        access_token = issue_access_token(client_id, auth_info["user"], auth_info["scopes"])
+        refresh_token_value = TOKEN_POOL.get()
         
+        # Store the refresh token (the access token needs no storage)
         storage.refresh_tokens[refresh_token_value] = {
             "client_id": client_id,
             "user": auth_info["user"],
-            "scopes": auth_info["scopes"]
+            "scopes": auth_info["scopes"],
+            "scope_set": frozenset(auth_info["scopes"])
         }
         
         # Remove used authorization code
@@ -213,7 +415,7 @@ def oauth_token(
         return {
             "access_token": access_token,
             "token_type": "Bearer",
-            "expires_in": 3600,
+            "expires_in": ACCESS_TOKEN_TTL,
             "refresh_token": refresh_token_value,
             "scope": " ".join(auth_info["scopes"])
         }
@@ -228,57 +430,44 @@ def oauth_token(
             return {"error": "invalid_grant", "error_description": "Invalid refresh token"}
         
         # Validate client matches
-        if refresh_info["client_id"] != client_id:
+        if not secure_equals(refresh_info["client_id"], client_id):
             return {"error": "invalid_grant", "error_description": "Token was issued to different client"}
         
         # Handle scope restriction
         if scope:
             requested_scopes = scope.split()
-            for s in requested_scopes:
-                if s not in refresh_info["scopes"]:
-                    return {"error": "invalid_scope", "error_description": f"Scope '{s}' not in original grant"}
+            if not refresh_info["scope_set"].issuperset(requested_scopes):
+                s = next(s for s in requested_scopes if s not in refresh_info["scope_set"])
+                return {"error": "invalid_scope", "error_description": f"Scope '{s}' not in original grant"}
             scopes = requested_scopes
         else:
             scopes = refresh_info["scopes"]
         
         # Generate new access token
-        access_token = secrets.token_urlsafe(32)
-        storage.access_tokens[access_token] = {
-            "client_id": client_id,
-            "user": refresh_info["user"],
-            "scopes": scopes,
-            "expires_at": time.time() + 3600
-        }
+        access_token = issue_access_token(client_id, refresh_info["user"], scopes)
         
         return {
             "access_token": access_token,
             "token_type": "Bearer",
-            "expires_in": 3600,
+            "expires_in": ACCESS_TOKEN_TTL,
             "scope": " ".join(scopes)
         }
     
     elif grant_type == "client_credentials":
         # Client credentials flow (no user involved)
-        # Generate access token for client itself
-        access_token = secrets.token_urlsafe(32)
-        
         # Use client's allowed scopes
         scopes = scope.split() if scope else client["allowed_scopes"]
-        for s in scopes:
-            if s not in client["allowed_scopes"]:
-                return {"error": "invalid_scope", "error_description": f"Scope '{s}' not allowed"}
+        if not client["scope_set"].issuperset(scopes):
+            s = next(s for s in scopes if s not in client["scope_set"])
+            return {"error": "invalid_scope", "error_description": f"Scope '{s}' not allowed"}
         
-        storage.access_tokens[access_token] = {
-            "client_id": client_id,
-            "user": None,  # No user for client credentials
-            "scopes": scopes,
-            "expires_at": time.time() + 3600
-        }
+        # Generate access token for client itself (no user)
+        access_token = issue_access_token(client_id, None, scopes)
         
         return {
             "access_token": access_token,
             "token_type": "Bearer",
-            "expires_in": 3600,
+            "expires_in": ACCESS_TOKEN_TTL,
             "scope": " ".join(scopes)
         }
     
@@ -294,8 +483,10 @@ def oauth_introspect(token: str, token_type_hint: Optional[str] = "access_token"
         token: The token to introspect
         token_type_hint: Hint about token type ('access_token' or 'refresh_token')
     """
+    storage.sweep_expired(time.time())
+    
     # Check access tokens first
-    token_info = storage.access_tokens.get(token)
+    token_info = decode_access_token(token)
     if token_info:
         is_active = time.time() < token_info["expires_at"]
         return {
@@ -305,7 +496,7 @@ def oauth_introspect(token: str, token_type_hint: Optional[str] = "access_token"
             "username": token_info["user"],
             "token_type": "Bearer",
             "exp": int(token_info["expires_at"]),
-            "iat": int(token_info["expires_at"] - 3600)
+            "iat": token_info["issued_at"]
         }
     
     # Check refresh tokens
@@ -320,7 +511,7 @@ def oauth_introspect(token: str, token_type_hint: Optional[str] = "access_token"
         }
     
     # Token not found or invalid
-    return {"active": False}
+    return INACTIVE_TOKEN
 
 @mcp.tool()
 def oauth_revoke(token: str, token_type_hint: Optional[str] = None) -> Dict[str, str]:
@@ -334,8 +525,10 @@ def oauth_revoke(token: str, token_type_hint: Optional[str] = None) -> Dict[str,
     revoked = False
     
     # Try to revoke as access token
-    if token in storage.access_tokens:
-        del storage.access_tokens[token]
+    token_info = decode_access_token(token)
+    if token_info:
+        storage.revoke_index(token_info["revocation_index"])
+        storage.validation_cache.pop(token, None)
         revoked = True
     
     # Try to revoke as refresh token
@@ -357,19 +550,17 @@ def protected_resource(access_token: str, resource: str) -> Dict[str, Any]:
         access_token: Bearer token for authorization
         resource: The resource to access
     """
-    # Validate token
-    token_info = storage.access_tokens.get(access_token)
-    
-    if not token_info:
-        return {"error": "invalid_token", "error_description": "Invalid or expired token"}
+    storage.sweep_expired(time.time())
     
-    if time.time() > token_info["expires_at"]:
-        return {"error": "invalid_token", "error_description": "Token expired"}
+    # Validate token
+    token_info, error = validate_access_token(access_token)
+    if error:
+        return error
     
     # Check scopes for different resources
     if resource == "profile":
         if "profile" not in token_info["scopes"]:
-            return {"error": "insufficient_scope", "error_description": "Requires 'profile' scope"}
+            return INSUFFICIENT_SCOPE_ERRORS["profile"]
         
         user = storage.users.get(token_info["user"])
         return {
@@ -380,21 +571,21 @@ def protected_resource(access_token: str, resource: str) -> Dict[str, Any]:
     
     elif resource == "data":
         if "read" not in token_info["scopes"]:
-            return {"error": "insufficient_scope", "error_description": "Requires 'read' scope"}
+            return INSUFFICIENT_SCOPE_ERRORS["read"]
         
         return {
             "data": f"Secret data for {token_info['user'] or 'client'}",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _iso_timestamp(int(time.time()))
         }
     
     elif resource == "admin":
         if "admin" not in token_info["scopes"]:
-            return {"error": "insufficient_scope", "error_description": "Requires 'admin' scope"}
+            return INSUFFICIENT_SCOPE_ERRORS["admin"]
         
         return {
             "total_users": len(storage.users),
             "total_clients": len(storage.clients),
-            "active_tokens": len(storage.access_tokens),
+            "revoked_access_tokens": storage.revoked_count(),
             "active_refresh_tokens": len(storage.refresh_tokens)
         }
     
@@ -410,16 +601,12 @@ def oauth_userinfo(access_token: str) -> Dict[str, Any]:
         access_token: Bearer token with 'profile' scope
     """
     # Validate token
-    token_info = storage.access_tokens.get(access_token)
-    
-    if not token_info:
-        return {"error": "invalid_token", "error_description": "Invalid or expired token"}
-    
-    if time.time() > token_info["expires_at"]:
-        return {"error": "invalid_token", "error_description": "Token expired"}
+    token_info, error = validate_access_token(access_token)
+    if error:
+        return error
     
     if "profile" not in token_info["scopes"]:
-        return {"error": "insufficient_scope", "error_description": "Requires 'profile' scope"}
+        return INSUFFICIENT_SCOPE_ERRORS["profile"]
     
     if not token_info["user"]:
         return {"error": "invalid_request", "error_description": "No user associated with token"}
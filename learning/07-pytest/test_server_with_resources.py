@@ -0,0 +1,49 @@
+# Test file for the calculator-with-history server from learning/01-hello-world
+import sys
+
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+
+# Import the server module
+sys.path.append('learning/01-hello-world')
+
+from server_with_resources import _compile_expr, mcp
+
+
+@pytest.fixture(scope="module")
+async def client(anyio_backend):
+    """One connected client session, shared by every test in this module"""
+    async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+        yield client
+
+@pytest.mark.anyio
+async def test_calculate_arithmetic(client):
+    """Test that plain arithmetic evaluates"""
+    result = await client.call_tool("calculate", {"expression": "(2 + 3) * 4 - -1 / 2"})
+    assert result.isError is False
+    assert "20.5" in result.content[0].text
+
+@pytest.mark.parametrize("expression", [
+    '__import__("os")',
+    "(1).real",
+    "2 ** 8",
+    "True + 1",
+])
+def test_calculate_rejects_non_arithmetic(expression):
+    """Test that calls, attribute access, powers and booleans are rejected"""
+    with pytest.raises(ValueError):
+        _compile_expr(expression)
+
+@pytest.mark.anyio
+async def test_calculate_rejected_by_tool(client):
+    """Test that a rejected expression comes back as a tool error"""
+    result = await client.call_tool("calculate", {"expression": '__import__("os").getcwd()'})
+    assert result.isError is True
+    assert "Unsupported expression" in result.content[0].text
+
+@pytest.mark.anyio
+async def test_calculate_recorded_in_history(client):
+    """Test that calculation results reach the recent history resource"""
+    await client.call_tool("calculate", {"expression": "7 * 6"})
+    result = await client.read_resource("history://recent")
+    assert "7 * 6 = 42" in result.contents[0].text
@@ -4,8 +4,7 @@ Streamable HTTP client for Task Manager MCP Server
 This client populates tasks for MCP learning modules
 """
 
-import asyncio
-import json
+import orjson
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 
@@ -196,41 +195,14 @@ async def populate_learning_tasks():
             await session.initialize()
             print("✓ Connected to server")
             
-            # List available tools
-            tools = await session.list_tools()
-            print(f"✓ Found {len(tools.tools)} tools available")
-            
             # Create tasks for each learning module
             print("\nCreating learning module tasks...")
-            created_tasks = []
+            # One call creates every task, already in its target status
+            result = await session.call_tool("create_tasks_bulk", arguments={"tasks": MCP_LEARNING_TASKS})
             
-            for task_data in MCP_LEARNING_TASKS:
-                # Create the task
-                result = await session.call_tool(
-                    "create_task",
-                    arguments={
-                        "title": task_data["title"],
-                        "description": task_data["description"],
-                        "priority": task_data["priority"],
-                        "tags": task_data["tags"]
-                    }
-                )
-                
-                if result.content and len(result.content) > 0:
-                    task = json.loads(result.content[0].text)
-                    created_tasks.append(task)
-                    
-                    # Update status if not pending
-                    if task_data["status"] != "pending":
-                        status_result = await session.call_tool(
-                            "update_task_status",
-                            arguments={
-                                "task_id": task["id"],
-                                "status": task_data["status"]
-                            }
-                        )
-                        
-                    print(f"  ✓ Created: {task_data['title']} [{task_data['status']}]")
+            created_tasks = [orjson.loads(item.text) for item in result.content]
+            for task in created_tasks:
+                print(f"  ✓ Created: {task['title']} [{task['status']}]")
             
             print(f"\n✓ Successfully created {len(created_tasks)} tasks")
             
@@ -239,7 +211,7 @@ async def populate_learning_tasks():
             stats_result = await session.call_tool("get_task_stats", arguments={})
             
             if stats_result.content and len(stats_result.content) > 0:
-                stats = json.loads(stats_result.content[0].text)
+                stats = orjson.loads(stats_result.content[0].text)
                 print("\nTask Statistics:")
                 print(f"  Total Tasks: {stats['total_tasks']}")
                 print(f"  Completed: {stats['by_status']['completed']}")
@@ -250,14 +222,9 @@ async def populate_learning_tasks():
             
             # Get task summary resource
             print("\nFetching task summary resource...")
-            resources = await session.list_resources()
-            
-            for resource in resources.resources:
-                if resource.uri == "tasks://summary":
-                    summary_result = await session.read_resource(resource.uri)
-                    if summary_result.contents and len(summary_result.contents) > 0:
-                        print("\n" + summary_result.contents[0].text)
-                    break
+            summary_result = await session.read_resource("tasks://summary")
+            if summary_result.contents and len(summary_result.contents) > 0:
+                print("\n" + summary_result.contents[0].text)
             
             print("\n✓ Task population complete!")
 
@@ -280,4 +247,9 @@ async def main():
         print("\nMake sure the server is running on http://localhost:8000")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    run(main())
\ No newline at end of file
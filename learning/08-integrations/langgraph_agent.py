@@ -1,3 +1,5 @@
+import asyncio
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -25,22 +27,23 @@ async def main():
         "openai:gpt-4o-mini",
         tools
     )
-    question = "what's (3 + 5) x 12?"
-    math_response = await agent.ainvoke(
-        {"messages": [{"role": "user", "content": question}]}
-    )
-    print(f"You asked: {question}")
-    print(math_response.get("messages")[-1].content)
-
-    question = "what is the current weather in nyc?"
-    weather_response = await agent.ainvoke(
-        {"messages": [{"role": "user", "content": question}]}
+    questions = [
+        "what's (3 + 5) x 12?",
+        "what is the current weather in nyc?",
+    ]
+    # The questions are independent, so their LLM and tool round trips can overlap
+    responses = await asyncio.gather(
+        *(agent.ainvoke({"messages": [{"role": "user", "content": question}]}) for question in questions)
     )
-    print(f"You asked: {question}")
-    print(weather_response.get("messages")[-1].content)
+    for question, response in zip(questions, responses):
+        print(f"You asked: {question}")
+        print(response.get("messages")[-1].content)
 
 
 if __name__ == "__main__":
-    import asyncio
-
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
+    run(main())
\ No newline at end of file
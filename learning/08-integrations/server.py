@@ -1,9 +1,12 @@
 # Complete task management MCP server
+import bisect
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel, Field
 from mcp.server.fastmcp import FastMCP
-import json
+import orjson
 import sys
 
 # Create server with HTTP support
@@ -13,21 +16,77 @@ mcp = FastMCP(
     port=8000
 )
 
-# Task model
-class Task(BaseModel):
+# Task model: a plain dataclass, as tool inputs are validated on the way in (TaskInput)
+@dataclass
+class Task:
     id: str
     title: str
     description: str = ""
     status: str = "pending"  # pending, in_progress, completed
+    priority: int = 3  # 1 to 5
+    created_at: datetime = field(default_factory=datetime.now)
+    updated_at: datetime = field(default_factory=datetime.now)
+    tags: List[str] = field(default_factory=list)
+
+# Validated task fields from a tool call, optionally with a starting status
+class TaskInput(BaseModel):
+    title: str
+    description: str = ""
     priority: int = Field(default=3, ge=1, le=5)
-    created_at: datetime = Field(default_factory=datetime.now)
-    updated_at: datetime = Field(default_factory=datetime.now)
     tags: List[str] = []
+    status: str = "pending"
 
 # In-memory task storage (use database in production)
 tasks_db: dict[str, Task] = {}
 next_id = 1
 
+# Incremental indexes over tasks_db, kept in step by the tools that change tasks
+tasks_by_status: dict[str, set[str]] = {"pending": set(), "in_progress": set(), "completed": set()}
+tasks_by_tag: defaultdict[str, set[str]] = defaultdict(set)
+priority_sum = 0
+
+# (-priority, created_at, insertion number, task id) for every task, kept in list_tasks order;
+# priority and created_at never change, and the insertion number keeps ties in creation order
+sorted_task_keys: list[tuple[int, datetime, int, str]] = []
+
+# JSON-ready form of each task (datetimes as ISO strings), refreshed whenever the task changes
+tasks_json: dict[str, dict] = {}
+
+# Bumped on every change to tasks_db; rendered resources are reused until it moves
+write_version = 0
+cached_resources: dict[str, tuple[int, str]] = {}  # resource URI -> (write_version, text)
+
+def add_task(task: Task) -> None:
+    """Store a new task and record it in the indexes"""
+    global priority_sum, write_version
+    tasks_db[task.id] = task
+    tasks_by_status[task.status].add(task.id)
+    # Tags repeat across tasks, so every task shares one copy of each tag string
+    task.tags = [sys.intern(tag) for tag in task.tags]
+    for tag in task.tags:
+        tasks_by_tag[tag].add(task.id)
+    priority_sum += task.priority
+    bisect.insort(sorted_task_keys, (-task.priority, task.created_at, len(sorted_task_keys), task.id))
+    tasks_json[task.id] = task_to_json(task)
+    write_version += 1
+
+def task_to_json(task: Task) -> dict:
+    """JSON-ready dict for a task, with its datetimes as ISO strings"""
+    return {
+        **asdict(task),
+        "created_at": task.created_at.isoformat(),
+        "updated_at": task.updated_at.isoformat()
+    }
+
+def cached_resource(uri: str, render) -> str:
+    """Return the resource's text, re-rendering only if tasks changed since the last read"""
+    cached = cached_resources.get(uri)
+    if cached is not None and cached[0] == write_version:
+        return cached[1]
+    text = render()
+    cached_resources[uri] = (write_version, text)
+    return text
+
 @mcp.tool()
 def create_task(
     title: str, 
@@ -37,22 +96,57 @@ def create_task(
 ) -> Task:
     """Create a new task"""
     global next_id
+    task_input = TaskInput(title=title, description=description, priority=priority, tags=tags)
     task_id = f"task_{next_id}"
     next_id += 1
     
+    # One clock read serves both timestamps
+    now = datetime.now()
     task = Task(
         id=task_id,
-        title=title,
-        description=description,
-        priority=priority,
-        tags=tags
+        title=task_input.title,
+        description=task_input.description,
+        priority=task_input.priority,
+        created_at=now,
+        updated_at=now,
+        tags=task_input.tags
     )
-    tasks_db[task_id] = task
+    add_task(task)
     return task
 
+@mcp.tool()
+def create_tasks_bulk(tasks: List[TaskInput]) -> List[Task]:
+    """Create several tasks in one call, each optionally starting in a non-pending status"""
+    global next_id
+    for task_input in tasks:
+        if task_input.status not in ["pending", "in_progress", "completed"]:
+            raise ValueError(f"Invalid status: {task_input.status}")
+    
+    # Reserve the whole id range up front, then build the tasks
+    start = next_id
+    next_id += len(tasks)
+    
+    now = datetime.now()
+    created = []
+    for task_number, task_input in enumerate(tasks, start):
+        task = Task(
+            id=f"task_{task_number}",
+            title=task_input.title,
+            description=task_input.description,
+            status=task_input.status,
+            priority=task_input.priority,
+            created_at=now,
+            updated_at=now,
+            tags=task_input.tags
+        )
+        add_task(task)
+        created.append(task)
+    return created
+
 @mcp.tool()
 def update_task_status(task_id: str, status: str) -> Task:
     """Update task status"""
+    global write_version
     if task_id not in tasks_db:
         raise ValueError(f"Task {task_id} not found")
     
@@ -60,8 +154,12 @@ def update_task_status(task_id: str, status: str) -> Task:
         raise ValueError(f"Invalid status: {status}")
     
     task = tasks_db[task_id]
+    tasks_by_status[task.status].discard(task_id)
+    tasks_by_status[status].add(task_id)
     task.status = status
     task.updated_at = datetime.now()
+    tasks_json[task_id] = task_to_json(task)
+    write_version += 1
     return task
 
 @mcp.tool()
@@ -70,29 +168,27 @@ def list_tasks(
     tag: Optional[str] = None
 ) -> List[Task]:
     """List tasks with optional filtering"""
-    tasks = list(tasks_db.values())
-    
+    # Narrow down through the indexes, so only matching tasks are materialized
+    task_ids = None
     if status:
-        tasks = [t for t in tasks if t.status == status]
+        task_ids = tasks_by_status.get(status, set())
     
     if tag:
-        tasks = [t for t in tasks if tag in t.tags]
+        tagged = tasks_by_tag.get(tag, set())
+        task_ids = tagged if task_ids is None else task_ids & tagged
     
-    # Sort by priority (high to low) and creation time
-    tasks.sort(key=lambda t: (-t.priority, t.created_at))
-    return tasks
+    # Walk the presorted keys: by priority (high to low) and creation time
+    if task_ids is None:
+        return [tasks_db[key[-1]] for key in sorted_task_keys]
+    return [tasks_db[key[-1]] for key in sorted_task_keys if key[-1] in task_ids]
 
 @mcp.tool()
 def get_task_stats() -> dict:
     """Get task statistics"""
     total = len(tasks_db)
-    by_status = {
-        "pending": sum(1 for t in tasks_db.values() if t.status == "pending"),
-        "in_progress": sum(1 for t in tasks_db.values() if t.status == "in_progress"),
-        "completed": sum(1 for t in tasks_db.values() if t.status == "completed")
-    }
+    by_status = {status: len(task_ids) for status, task_ids in tasks_by_status.items()}
     
-    avg_priority = sum(t.priority for t in tasks_db.values()) / total if total > 0 else 0
+    avg_priority = priority_sum / total if total > 0 else 0
     
     return {
         "total_tasks": total,
@@ -104,16 +200,19 @@ def get_task_stats() -> dict:
 @mcp.resource("tasks://all")
 def export_all_tasks() -> str:
     """Export all tasks as JSON"""
-    tasks_list = [task.model_dump() for task in tasks_db.values()]
-    # Convert datetime objects to strings
-    for task in tasks_list:
-        task['created_at'] = task['created_at'].isoformat()
-        task['updated_at'] = task['updated_at'].isoformat()
-    return json.dumps(tasks_list, indent=2)
+    return cached_resource("tasks://all", render_all_tasks)
+
+def render_all_tasks() -> str:
+    """Serialize every task to indented JSON"""
+    return orjson.dumps(list(tasks_json.values()), option=orjson.OPT_INDENT_2).decode()
 
 @mcp.resource("tasks://summary")
 def get_task_summary() -> str:
     """Get a summary of current tasks"""
+    return cached_resource("tasks://summary", render_task_summary)
+
+def render_task_summary() -> str:
+    """Format the task statistics as a text summary"""
     stats = get_task_stats()
     summary = f"""Task Summary
 =============
@@ -129,46 +228,49 @@ Average Priority: {stats['average_priority']}/5
 @mcp.prompt(title="Daily Standup")
 def daily_standup() -> str:
     """Generate a daily standup report"""
-    in_progress = list_tasks(status="in_progress")
-    completed_today = [
-        t for t in list_tasks(status="completed")
-        if t.updated_at.date() == datetime.now().date()
-    ]
-    high_priority_pending = [
-        t for t in list_tasks(status="pending")
-        if t.priority >= 4
-    ]
-    
-    report = "Daily Standup Report\n\n"
-    
-    report += "📋 In Progress:\n"
-    for task in in_progress:
-        report += f"  - {task.title} (Priority: {task.priority})\n"
+    # list_tasks narrows through the status index and keeps the priority order
+    today = datetime.now().date()
+    parts = ["Daily Standup Report\n\n", "📋 In Progress:\n"]
+    parts.extend(
+        f"  - {task.title} (Priority: {task.priority})\n"
+        for task in list_tasks(status="in_progress")
+    )
     
-    report += "\n✅ Completed Today:\n"
-    for task in completed_today:
-        report += f"  - {task.title}\n"
+    parts.append("\n✅ Completed Today:\n")
+    parts.extend(
+        f"  - {task.title}\n"
+        for task in list_tasks(status="completed")
+        if task.updated_at.date() == today
+    )
     
-    report += "\n🔥 High Priority Pending:\n"
-    for task in high_priority_pending:
-        report += f"  - {task.title} (Priority: {task.priority})\n"
+    parts.append("\n🔥 High Priority Pending:\n")
+    parts.extend(
+        f"  - {task.title} (Priority: {task.priority})\n"
+        for task in list_tasks(status="pending")
+        if task.priority >= 4
+    )
     
-    return report
+    return "".join(parts)
 
 if __name__ == "__main__":
     # Determine transport mode from command line argument
     # Valid options: stdio, sse, streamable-http
     transport = sys.argv[1] if len(sys.argv) > 1 else "stdio"
     
+    try:
+        from uvloop import run
+    except ImportError:
+        from asyncio import run
+    
     print(f"\nStarting Task Manager MCP Server")
     
     # Handle different transport modes
     if transport == "sse":
         print(f"\nStarting SSE server on http://localhost:8000")
-        mcp.run(transport="sse")
+        run(mcp.run_sse_async())
     elif transport == "streamable-http":
         print(f"\nStarting Streamable HTTP server on http://localhost:8000")
-        mcp.run(transport="streamable-http")
+        run(mcp.run_streamable_http_async())
     else:
         print("\nStarting in stdio mode")
-        mcp.run(transport="stdio")
\ No newline at end of file
+        run(mcp.run_stdio_async())
\ No newline at end of file
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+MemoizeIt-style profiler for the tutorial's MCP tools and prompts.
+
+Replays a recorded client trace (the calls made by the learning/*/client.py scripts)
+directly against the registered tool/prompt functions and ranks them as caching candidates:
+
+1. Profile: call count and average latency per tool/prompt
+2. Check input/output invariance: repeated calls with the same arguments must return
+   equal results and must not change module-level state (history lists, caches, ...)
+3. Rank by estimated saved time: calls * (avg latency - cost of an lru_cache hit)
+4. Report: targets where a hit saves most of the call's latency are worth an @lru_cache
+
+Run: uv run python tools/profile_memoize.py [repeats]
+"""
+
+import copy
+import importlib.util
+import inspect
+import sys
+import time
+from collections.abc import Sized
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+LEARNING_DIR = Path(__file__).resolve().parent.parent / "learning"
+
+# A target is only worth caching if a hit saves at least this fraction of its latency
+MIN_SAVED_FRACTION = 0.5
+
+# (server module, tool/prompt name, arguments) as issued by the example clients
+TRACE: list[tuple[str, str, dict[str, Any]]] = [
+    ("01-hello-world/server.py", "add", {"a": 5, "b": 3}),
+    ("01-hello-world/server.py", "multiply", {"a": 4, "b": 7}),
+    ("01-hello-world/server.py", "divide", {"a": 10.0, "b": 4.0}),
+    ("01-hello-world/server_with_resources.py", "add", {"a": 5, "b": 3}),
+    ("01-hello-world/server_with_resources.py", "multiply", {"a": 4, "b": 7}),
+    ("01-hello-world/server_with_resources.py", "calculate", {"expression": "5 + 3"}),
+    ("03-output-schema/server.py", "get_weather", {"city": "London"}),
+    ("03-output-schema/server.py", "compare_weather", {"cities": ["London", "Paris", "Tokyo"]}),
+    *[
+        ("04-prompts/server.py", "review_python", {"code": "def f(n):\n    return n * 2\n", "focus_area": focus})
+        for focus in ("general", "performance", "testing")
+    ],
+    ("04-prompts/server.py", "debug_error", {"error_message": "IndexError: list index out of range"}),
+    *[
+        ("04-prompts/server.py", "explain_code", {"code": "def f(n):\n    return n * 2\n", "audience": audience})
+        for audience in ("beginner", "developer", "reviewer")
+    ],
+]
+
+def load_server(relative_path: str) -> ModuleType:
+    """Import a learning server module by file path (directory names aren't importable)"""
+    path = LEARNING_DIR / relative_path
+    spec = importlib.util.spec_from_file_location(f"_profiled_{path.parent.name}_{path.stem}", path)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def registered_callables(module: ModuleType) -> dict[str, Any]:
+    """Map tool/prompt names to the functions FastMCP dispatches to"""
+    mcp = module.mcp
+    callables = {tool.name: tool.fn for tool in mcp._tool_manager.list_tools()}
+    callables.update({prompt.name: prompt.fn for prompt in mcp._prompt_manager.list_prompts()})
+    return callables
+
+def state_snapshot(module: ModuleType) -> dict[str, Any]:
+    """Copies of the module-level containers, used to detect side effects
+
+    Contents are compared rather than sizes: a bounded deque that is already full keeps
+    its length while every append still changes it.
+    """
+    return {
+        name: copy.deepcopy(value)
+        for name, value in vars(module).items()
+        if isinstance(value, Sized) and not isinstance(value, (str, bytes, type)) and not name.startswith("__")
+    }
+
+def freeze(value: Any) -> Any:
+    """Hashable stand-in for an argument value (what a cache key would have to look like)"""
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+def time_ns(func: Any, repeats: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter_ns() - start) / repeats
+
+def call(fn: Any, arguments: dict[str, Any]) -> Any:
+    result = fn(**arguments)
+    assert not inspect.iscoroutine(result), "async tools are not profiled"
+    return result
+
+def profile(repeats: int) -> list[dict[str, Any]]:
+    modules: dict[str, ModuleType] = {}
+    stats: dict[tuple[str, str], dict[str, Any]] = {}
+
+    for relative_path, name, arguments in TRACE:
+        module = modules.setdefault(relative_path, load_server(relative_path))
+        fn = registered_callables(module)[name]
+        entry = stats.setdefault(
+            (relative_path, name),
+            {"target": f"{relative_path}:{name}", "calls": 0, "latency_ns": 0.0, "lookup_ns": 0.0, "pure": True},
+        )
+
+        before = state_snapshot(module)
+        first = call(fn, arguments)
+        second = call(fn, arguments)
+        if first != second or state_snapshot(module) != before:
+            entry["pure"] = False
+
+        # A cache hit costs an lru_cache lookup, plus freezing any unhashable (list/dict) arguments
+        cached = lru_cache(maxsize=None)(lambda **kwargs: first)
+        hashable = all(freeze(value) is value for value in arguments.values())
+
+        def lookup() -> Any:
+            if hashable:
+                return cached(**arguments)
+            return cached(**{key: freeze(value) for key, value in arguments.items()})
+
+        lookup()
+
+        entry["calls"] += 1
+        entry["latency_ns"] += time_ns(lambda: fn(**arguments), repeats)
+        entry["lookup_ns"] += time_ns(lookup, repeats)
+
+    report = []
+    for entry in stats.values():
+        calls = entry["calls"]
+        entry["latency_ns"] /= calls
+        entry["lookup_ns"] /= calls
+        entry["saving_ns"] = calls * (entry["latency_ns"] - entry["lookup_ns"]) if entry["pure"] else 0.0
+        report.append(entry)
+    report.sort(key=lambda e: e["saving_ns"], reverse=True)
+    return report
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    report = profile(repeats)
+
+    print(f"{'target':<50} {'calls':>5} {'avg ns':>10} {'lookup ns':>9} {'saved ns':>10}  verdict")
+    print("-" * 100)
+    for entry in report:
+        if not entry["pure"]:
+            verdict = "not cacheable (side effects or varying output)"
+        elif entry["saving_ns"] >= MIN_SAVED_FRACTION * entry["calls"] * entry["latency_ns"]:
+            verdict = "cache candidate"
+        else:
+            verdict = "not worth it (cache lookup costs about as much as the call)"
+        print(
+            f"{entry['target']:<50} {entry['calls']:>5} {entry['latency_ns']:>10.0f} "
+            f"{entry['lookup_ns']:>9.0f} {entry['saving_ns']:>10.0f}  {verdict}"
+        )
+
+if __name__ == "__main__":
+    main()